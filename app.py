@@ -1,26 +1,43 @@
+import functools
+import hashlib
+import itertools
+import json
+import logging
 import math
-from flask import Flask, render_template, request, redirect, flash
+import os
+import random
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import click
+from logging.handlers import RotatingFileHandler
+from collections import namedtuple
+from types import SimpleNamespace
+from bisect import bisect_left
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, flash, jsonify, g, has_request_context, session, url_for
+from flask import before_render_template, template_rendered
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
-from datetime import datetime
-from flask_migrate import Migrate
-import matplotlib.pyplot as plt
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from datetime import date, datetime, timedelta
+from flask_migrate import Migrate, stamp
+import numpy as np
+
+import metrics
+import durations
+import pricing
+from durations import DURATION_BINS, duration_bin
+from config import DEFAULT_SECRET_KEY, Config, DevelopmentConfig
 
-plt.switch_backend('Agg')  # Use a non-interactive backend for matplotlib
-
-app = Flask(__name__)
-
-# Set the secret key for flash messages
-app.config['SECRET_KEY'] = 'sweet_and_sour'
-
-# Configure the database
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///parkease.db'
 db = SQLAlchemy()
-db.init_app(app)
+migrate = Migrate()
 
-migrate = Migrate(app, db)
+# Routes, hooks and CLI commands; create_app() registers them on an app
+bp = Blueprint('parkease', __name__, cli_group=None)
 
-app.app_context().push()
 
 # ------------------ MODELS ------------------
 
@@ -34,6 +51,8 @@ class User(db.Model):
     address = db.Column(db.String(255), nullable=False, unique=True)
     pincode = db.Column(db.String(6), nullable=False)
     is_superUser = db.Column(db.Boolean, default=False)
+    # Per-account cap on active reservations (e.g. corporate fleets); NULL uses MAX_ACTIVE_RESERVATIONS
+    max_active_reservations = db.Column(db.Integer, nullable=True)
 
 class ParkingLot(db.Model):
     __tablename__ = 'parking_lot'
@@ -44,9 +63,24 @@ class ParkingLot(db.Model):
     price_per_hour = db.Column(db.Float, nullable=False)
     max_spots = db.Column(db.Integer, nullable=False)
 
+    # Optional time-of-day/tiered tariff as JSON (see pricing.py); NULL bills a flat price_per_hour
+    tariff = db.Column(db.Text, nullable=True)
+
+    # Optional coordinates, used by the nearest-lot search
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+
+    # Denormalized spot counters, kept in step with ParkingSpot.status in the same transaction
+    available_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    occupied_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     user_id = db.Column(db.Integer, db.ForeignKey('user_details.uid'), nullable=False)
     user = db.relationship('User', backref='parking_lot')
 
+    __table_args__ = (
+        db.Index('ix_parking_lot_pin_code', 'pin_code'),
+    )
+
 class ParkingSpot(db.Model):
     __tablename__ = 'parking_spot'
     ps_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
@@ -57,6 +91,11 @@ class ParkingSpot(db.Model):
     status = db.Column(db.String(1), nullable=False, default='A')  # A = Available, O = Occupied
     spot_number = db.Column(db.Integer, nullable=False)
 
+    __table_args__ = (
+        # spot_number is included so "first free spot in a lot" is a single index seek
+        db.Index('ix_parking_spot_lot_id_status', 'lot_id', 'status', 'spot_number'),
+    )
+
 
 class Reservation(db.Model):
     __tablename__ = 'reservations'
@@ -74,32 +113,1941 @@ class Reservation(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user_details.uid'), nullable=False)
     user = db.relationship('User', backref='reservations')
 
+    __table_args__ = (
+        db.Index('ix_reservations_user_id_status', 'user_id', 'status'),
+        db.Index('ix_reservations_user_id_parking_timestamp', 'user_id', 'parking_timestamp', 'id'),
+        # One active reservation per vehicle, enforced by the database itself
+        db.Index('ux_reservations_active_vehicle', 'vehicle_number', unique=True,
+                 sqlite_where=db.text("status = 'Active'")),
+        db.Index('ix_reservations_spot_id_parking_timestamp', 'spot_id', 'parking_timestamp'),
+    )
+
+
+class SpotHold(db.Model):
+    # Advance booking of a spot for [start_time, end_time). 'Held' windows on one
+    # spot never overlap; a hold becomes a normal Reservation when checked in.
+    __tablename__ = 'spot_holds'
+
+    id = db.Column(db.Integer, primary_key=True)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='Held')  # Held, CheckedIn, Cancelled
+    vehicle_number = db.Column(db.String(20), nullable=False)
+
+    spot_id = db.Column(db.Integer, db.ForeignKey('parking_spot.ps_id'), nullable=False)
+    spot = db.relationship('ParkingSpot', backref='holds')
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user_details.uid'), nullable=False)
+    user = db.relationship('User', backref='holds')
+
+    __table_args__ = (
+        db.Index('ix_spot_holds_spot_id_status_start_time', 'spot_id', 'status', 'start_time'),
+        db.Index('ix_spot_holds_user_id_status_end_time', 'user_id', 'status', 'end_time'),
+        db.Index('ix_spot_holds_vehicle_number_status_start_time', 'vehicle_number', 'status', 'start_time'),
+    )
+
+
+class DataVersion(db.Model):
+    # Monotonic stamp per scope ('global' or 'user:<uid>'), bumped whenever the
+    # data behind that scope's summary charts changes
+    __tablename__ = 'data_versions'
+    scope = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class UserStat(db.Model):
+    # Running per-user summary statistics, updated as reservations are booked and
+    # released so userSummary never has to scan the user's history.
+    # kind: 'day' (key = YYYY-MM-DD, reservations started), 'lot' (key = lot id, amount spent),
+    #       'status' (key = Active/Released, reservation count), 'duration' (key = DURATION_BINS index)
+    __tablename__ = 'user_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('user_details.uid'), primary_key=True)
+    kind = db.Column(db.String(10), primary_key=True)
+    key = db.Column(db.String(20), primary_key=True)
+    value = db.Column(db.Float, nullable=False, default=0)
+
+
+class LotHourlyRollup(db.Model):
+    # Per-lot totals of released reservations for each hour: reservations started in
+    # the hour, spot-hours occupied during it, and revenue of reservations started in it
+    __tablename__ = 'lot_hourly_rollup'
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.pl_id'), primary_key=True)
+    hour = db.Column(db.DateTime, primary_key=True)
+    starts = db.Column(db.Integer, nullable=False, default=0)
+    occupied_hours = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+
+class LotDailyRollup(db.Model):
+    # Same totals as LotHourlyRollup, per calendar day
+    __tablename__ = 'lot_daily_rollup'
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.pl_id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    starts = db.Column(db.Integer, nullable=False, default=0)
+    occupied_hours = db.Column(db.Float, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+
+
+class LotOccupancy(db.Model):
+    # Hour-of-week occupancy per lot: a 7x24 float64 array (Monday 00:00 first) of
+    # occupied spot-hours summed over every released reservation since `since`
+    __tablename__ = 'lot_occupancy'
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.pl_id'), primary_key=True)
+    since = db.Column(db.DateTime, nullable=False)
+    hours = db.Column(db.LargeBinary, nullable=False)
+
+
+# ------------------ INSTRUMENTATION ------------------
+
+REQUEST_SECONDS = metrics.Histogram(
+    'parkease_request_duration_seconds', 'Wall time per request by endpoint.', metrics.SECONDS_BUCKETS)
+REQUEST_SQL_STATEMENTS = metrics.Histogram(
+    'parkease_request_sql_statements', 'SQL statements executed per request by endpoint.', metrics.COUNT_BUCKETS)
+REQUEST_SQL_SECONDS = metrics.Histogram(
+    'parkease_request_sql_duration_seconds', 'Time spent in SQL per request by endpoint.', metrics.SECONDS_BUCKETS)
+REQUEST_SAVEFIG_SECONDS = metrics.Histogram(
+    'parkease_request_savefig_duration_seconds', 'Time spent in matplotlib savefig by endpoint, for requests that drew a chart.',
+    metrics.SECONDS_BUCKETS)
+REQUEST_RENDER_SECONDS = metrics.Histogram(
+    'parkease_request_render_duration_seconds', 'Time spent rendering templates by endpoint, for requests that rendered one.',
+    metrics.SECONDS_BUCKETS)
+REQUEST_HISTOGRAMS = (REQUEST_SECONDS, REQUEST_SQL_STATEMENTS, REQUEST_SQL_SECONDS,
+                      REQUEST_SAVEFIG_SECONDS, REQUEST_RENDER_SECONDS)
+
+
+class RequestTimings:
+    __slots__ = ('started', 'sql_statements', 'sql_seconds', 'savefig_seconds', 'render_seconds', 'render_started')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.savefig_seconds = 0.0
+        self.render_seconds = 0.0
+        self.render_started = None
+
+
+def request_timings():
+    # The current request's RequestTimings, or None outside a request or with metrics off
+    return g.get('timings') if has_request_context() else None
+
+
+@bp.before_app_request
+def start_request_timings():
+    if current_app.config['METRICS_ENABLED']:
+        g.timings = RequestTimings()
+    if current_app.config['SLOW_QUERY_SECONDS'] is not None:
+        # Lets the slow-query report tell one request's repeated statements apart
+        g.request_id = f'{os.getpid()}-{next(request_ids)}'
+
+
+@bp.teardown_app_request
+def record_request_timings(exc):
+    # Teardown runs for failed requests too, so errors still show up in the latencies
+    timings = g.pop('timings', None)
+    if timings is None:
+        return
+    endpoint = request.endpoint or 'unmatched'
+    REQUEST_SECONDS.observe(endpoint, time.perf_counter() - timings.started)
+    REQUEST_SQL_STATEMENTS.observe(endpoint, timings.sql_statements)
+    REQUEST_SQL_SECONDS.observe(endpoint, timings.sql_seconds)
+    if timings.savefig_seconds:
+        REQUEST_SAVEFIG_SECONDS.observe(endpoint, timings.savefig_seconds)
+    if timings.render_seconds:
+        REQUEST_RENDER_SECONDS.observe(endpoint, timings.render_seconds)
+
+
+def register_engine_events(app, engine):
+    # Connection pragmas and statement timers for one app's engine. The settings are
+    # read once here, so connections and statements never need an app context.
+    busy_timeout_ms = int(app.config['SQLITE_BUSY_TIMEOUT_MS'])
+    journal_mode = app.config['SQLITE_JOURNAL_MODE']
+    synchronous = app.config['SQLITE_SYNCHRONOUS']
+    threshold = app.config['SLOW_QUERY_SECONDS']
+
+    @event.listens_for(engine, 'connect')
+    def configure_sqlite_connection(dbapi_connection, connection_record):
+        if not isinstance(dbapi_connection, sqlite3.Connection):
+            return
+        cursor = dbapi_connection.cursor()
+        # Busy timeout first: switching the journal mode itself may have to wait for a lock
+        cursor.execute(f"PRAGMA busy_timeout = {busy_timeout_ms}")
+        cursor.execute(f"PRAGMA journal_mode = {journal_mode}")
+        cursor.execute(f"PRAGMA synchronous = {synchronous}")
+        cursor.close()
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        # Kept on the statement's execution context, so a failed statement leaves nothing behind
+        context.statement_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_statement_time(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context.statement_started
+        timings = request_timings()
+        if timings is not None:
+            timings.sql_statements += 1
+            timings.sql_seconds += elapsed
+
+        if threshold is not None and elapsed >= threshold:
+            log_slow_query(app, cursor, statement, parameters, context, executemany, elapsed)
+
+
+# Text parameters whose values may be logged, by name without SQLAlchemy's _N suffix.
+# Any other text (usernames, names, phone numbers, addresses, pincodes, vehicle
+# numbers, passwords) is redacted; numbers and datetimes are always logged.
+SAFE_TEXT_PARAMETERS = frozenset({
+    'status', 'scope', 'kind', 'key', 'day', 'hour', 'lot_name', 'tariff',
+    'start_time', 'end_time', 'parking_timestamp', 'leaving_timestamp', 'coalesce',
+})
+PARAMETER_SUFFIX = re.compile(r'_\d+$')
+FINGERPRINT_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+FINGERPRINT_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+request_ids = itertools.count(1)
+slow_query_logger = logging.getLogger('parkease.slow_queries')
+slow_query_logger.propagate = False
+slow_query_logger.setLevel(logging.INFO)
+slow_query_lock = threading.Lock()
+
+
+def statement_fingerprint(statement):
+    # Same shape of statement, same fingerprint: literals become ?, IN lists
+    # collapse and whitespace is normalized, so one N+1 loop is one group
+    shape = FINGERPRINT_LITERALS.sub('?', statement)
+    shape = FINGERPRINT_LISTS.sub('(?...)', shape)
+    shape = ' '.join(shape.split())
+    return hashlib.sha1(shape.encode()).hexdigest()[:12], shape
+
+
+def loggable_parameters(parameters, context):
+    # Bound values by name, with text outside SAFE_TEXT_PARAMETERS replaced. Driver-level
+    # statements carry no names, so their text values are all redacted.
+    names = getattr(getattr(context, 'compiled', None), 'positiontup', None)
+
+    def loggable(name, value):
+        if isinstance(value, str) and PARAMETER_SUFFIX.sub('', name or '') not in SAFE_TEXT_PARAMETERS:
+            return '<redacted>'
+        if isinstance(value, (bytes, memoryview)):
+            return f'<{len(value)} bytes>'
+        if isinstance(value, (datetime, date)):
+            return value.isoformat(' ')
+        return value
+
+    if isinstance(parameters, dict):
+        return {name: loggable(name, value) for name, value in parameters.items()}
+    if names is None or len(names) != len(parameters):
+        return [loggable(None, value) for value in parameters]
+    return {name: loggable(name, value) for name, value in zip(names, parameters)}
+
+
+def query_plan(cursor, statement, parameters):
+    # EXPLAIN QUERY PLAN on the raw DBAPI connection, so it is neither timed nor logged itself
+    try:
+        rows = cursor.connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    except sqlite3.Error:
+        return None
+    return [row[-1] for row in rows]
+
+
+def slow_query_log_path(app):
+    return app.config['SLOW_QUERY_LOG'] or os.path.join(app.instance_path, 'slow_queries.jsonl')
+
+
+def slow_query_handler(app):
+    # Opened on the first slow statement, so nothing is created when none is slow
+    with slow_query_lock:
+        if not slow_query_logger.handlers:
+            path = slow_query_log_path(app)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            slow_query_logger.addHandler(RotatingFileHandler(
+                path, maxBytes=app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                backupCount=app.config['SLOW_QUERY_LOG_BACKUPS'], encoding='utf-8'))
+    return slow_query_logger
+
+
+def log_slow_query(app, cursor, statement, parameters, context, executemany, elapsed):
+    if executemany:
+        rows, parameters = len(parameters), parameters[0] if parameters else ()
+    else:
+        rows = 1
+    fingerprint, _ = statement_fingerprint(statement)
+    entry = {
+        'time': datetime.now().isoformat(timespec='milliseconds'),
+        'seconds': round(elapsed, 6),
+        'endpoint': request.endpoint if has_request_context() else None,
+        'request': g.get('request_id') if has_request_context() else None,
+        'fingerprint': fingerprint,
+        'statement': statement,
+        'parameters': loggable_parameters(parameters, context),
+        'executemany_rows': rows if executemany else None,
+        'plan': query_plan(cursor, statement, parameters),
+    }
+    slow_query_handler(app).info(json.dumps(entry, default=str))
+
+
+@before_render_template.connect
+def start_render_timer(sender, template, context, **extra):
+    timings = request_timings()
+    if timings is not None:
+        timings.render_started = time.perf_counter()
+
+
+@template_rendered.connect
+def record_render_time(sender, template, context, **extra):
+    timings = request_timings()
+    if timings is not None and timings.render_started is not None:
+        timings.render_seconds += time.perf_counter() - timings.render_started
+        timings.render_started = None
+
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    if not current_app.config['METRICS_ENABLED']:
+        return 'Metrics are disabled.', 404
+    return metrics.render(REQUEST_HISTOGRAMS), 200, {'Content-Type': metrics.CONTENT_TYPE}
+
+
+# ------------------ HELPERS ------------------
+
+def user_scope(uid):
+    return f'user:{uid}'
+
+
+def bump_data_version(*scopes):
+    # Upsert-increment inside the caller's transaction, so the stamp changes
+    # atomically with the data it describes
+    if not scopes:
+        return
+    stmt = sqlite_insert(DataVersion).on_conflict_do_update(
+        index_elements=[DataVersion.scope],
+        set_={'version': DataVersion.version + 1}
+    )
+    db.session.execute(stmt, [{'scope': scope, 'version': 1} for scope in scopes])
+
+
+def data_version(scope):
+    return db.session.execute(
+        db.select(DataVersion.version).where(DataVersion.scope == scope)
+    ).scalar() or 0
+
+
+def cached_chart(chart, scope, version, draw):
+    # Return the static path of the chart for (chart, scope, version), calling
+    # draw() to render it only when no cached file exists yet.
+    digest = hashlib.sha1(f'{chart}|{scope}|{version}'.encode()).hexdigest()[:16]
+    filename = f'charts/{chart}-{digest}.png'
+    path = os.path.join(current_app.static_folder, filename)
+
+    if os.path.exists(path):
+        os.utime(path)  # mark as recently used for eviction
+        return filename
+
+    chart_dir = os.path.dirname(path)
+    os.makedirs(chart_dir, exist_ok=True)
+    fig = draw()
+    # Write to a temp file unique to this call, then rename it into place, so viewers
+    # never see a partial image even when threads of one worker draw the same chart
+    fd, tmp_path = tempfile.mkstemp(dir=chart_dir, suffix='.tmp')
+    try:
+        started = time.perf_counter()
+        with os.fdopen(fd, 'wb') as tmp_file:
+            fig.savefig(tmp_file, format='png')
+        timings = request_timings()
+        if timings is not None:
+            timings.savefig_seconds += time.perf_counter() - started
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+    evict_charts()
+    return filename
+
+
+def evict_charts():
+    # Drop the least recently used charts once the cache is over its file or byte budget
+    chart_dir = os.path.join(current_app.static_folder, 'charts')
+    entries = []
+    for entry in os.scandir(chart_dir):
+        if entry.name.endswith('.png'):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort()
+
+    total_bytes = sum(size for _, size, _ in entries)
+    while entries and (len(entries) > current_app.config['CHART_CACHE_MAX_FILES']
+                       or total_bytes > current_app.config['CHART_CACHE_MAX_BYTES']):
+        _, size, path = entries.pop(0)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # already evicted by another worker
+        total_bytes -= size
+
+
+RECENT_RESERVATIONS_LIMIT = 100
+
+
+def wants_png_charts():
+    return current_app.config['SERVER_SIDE_CHARTS'] or request.args.get('format') == 'png'
+
+
+def chart_data_response(scope, build, variant=''):
+    # JSON chart series with an ETag tied to the scope's data version, so an
+    # unchanged summary costs the browser a 304 and the server no aggregation.
+    # `variant` distinguishes different views of the same scope (e.g. a date range).
+    response = jsonify({})
+    response.set_etag(f'{scope}-{data_version(scope)}{variant}')
+    response.make_conditional(request)
+    if response.status_code == 304:
+        return response
+
+    response.set_data(jsonify(build()).get_data())
+    return response
+
+
+def series(labels, values):
+    return {'labels': list(labels), 'values': list(values)}
+
+
+def bump_user_stat(user_id, kind, key, amount=1):
+    stmt = sqlite_insert(UserStat).values(user_id=user_id, kind=kind, key=str(key), value=amount)
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[UserStat.user_id, UserStat.kind, UserStat.key],
+        set_={'value': UserStat.value + amount}
+    ))
+
+
+def bump_user_stats(increments):
+    # Bulk bump_user_stat: {(user_id, kind, key): amount} applied with one executemany upsert
+    if not increments:
+        return
+    stmt = sqlite_insert(UserStat)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserStat.user_id, UserStat.kind, UserStat.key],
+        set_={'value': UserStat.value + stmt.excluded.value}
+    )
+    db.session.execute(stmt, [
+        {'user_id': user_id, 'kind': kind, 'key': str(key), 'value': amount}
+        for (user_id, kind, key), amount in increments.items()
+    ])
+
+
+def rollup_increments(reservation):
+    # Split a released reservation over the hours and days it covered.
+    # Returns ({hour: totals}, {day: totals}) with totals = starts/occupied_hours/revenue.
+    start, end = reservation.parking_timestamp, reservation.leaving_timestamp
+    hourly, daily = {}, {}
+
+    def add(buckets, key, starts=0, occupied_hours=0.0, revenue=0.0):
+        totals = buckets.setdefault(key, {'starts': 0, 'occupied_hours': 0.0, 'revenue': 0.0})
+        totals['starts'] += starts
+        totals['occupied_hours'] += occupied_hours
+        totals['revenue'] += revenue
+
+    hour = start.replace(minute=0, second=0, microsecond=0)
+    add(hourly, hour, starts=1, revenue=reservation.parking_cost or 0.0)
+    add(daily, start.date(), starts=1, revenue=reservation.parking_cost or 0.0)
+
+    while hour < end:
+        next_hour = hour + timedelta(hours=1)
+        overlap = (min(end, next_hour) - max(start, hour)).total_seconds() / 3600
+        if overlap > 0:
+            add(hourly, hour, occupied_hours=overlap)
+            add(daily, hour.date(), occupied_hours=overlap)
+        hour = next_hour
+
+    return hourly, daily
+
+
+def merge_rollups(into, increments):
+    # Add one reservation's (hourly, daily) increments into running (hourly, daily) totals
+    for buckets, additions in zip(into, increments):
+        for key, totals in additions.items():
+            merged = buckets.setdefault(key, {'starts': 0, 'occupied_hours': 0.0, 'revenue': 0.0})
+            for name, value in totals.items():
+                merged[name] += value
+
+
+def apply_rollups(lot_id, hourly, daily):
+    # Add bucket totals to the rollup tables with one multi-row upsert per table
+    for model, key, buckets in ((LotHourlyRollup, 'hour', hourly), (LotDailyRollup, 'day', daily)):
+        if not buckets:
+            continue
+        stmt = sqlite_insert(model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[model.lot_id, getattr(model, key)],
+            set_={
+                'starts': model.starts + stmt.excluded.starts,
+                'occupied_hours': model.occupied_hours + stmt.excluded.occupied_hours,
+                'revenue': model.revenue + stmt.excluded.revenue,
+            }
+        )
+        db.session.execute(stmt, [{'lot_id': lot_id, key: bucket, **totals} for bucket, totals in buckets.items()])
+
+
+def backfill_rollups():
+    # Rebuild both rollup tables and the occupancy matrices from every released reservation
+    db.session.execute(db.delete(LotHourlyRollup))
+    db.session.execute(db.delete(LotDailyRollup))
+    db.session.execute(db.delete(LotOccupancy))
+
+    per_lot = {}
+    occupancy = {}
+    released = db.select(Reservation, ParkingSpot.lot_id).join(
+        ParkingSpot, Reservation.spot_id == ParkingSpot.ps_id
+    ).where(Reservation.status != 'Active', Reservation.leaving_timestamp.is_not(None))
+
+    for reservation, lot_id in db.session.execute(released.execution_options(yield_per=1000)):
+        merge_rollups(per_lot.setdefault(lot_id, ({}, {})), rollup_increments(reservation))
+
+        since, matrix = occupancy.setdefault(lot_id, (reservation.parking_timestamp, np.zeros((7, 24))))
+        fold_occupancy(matrix, reservation.parking_timestamp, reservation.leaving_timestamp)
+        occupancy[lot_id] = (min(since, reservation.parking_timestamp), matrix)
+
+    for lot_id, (hourly, daily) in per_lot.items():
+        apply_rollups(lot_id, hourly, daily)
+    for lot_id, (since, matrix) in occupancy.items():
+        db.session.add(LotOccupancy(lot_id=lot_id, since=since, hours=matrix.tobytes()))
+    db.session.commit()
+
+
+WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+EPOCH = datetime(1970, 1, 1)  # a Thursday, i.e. weekday 3
+
+
+def hour_of_week_overlaps(start, end):
+    # Vectorized split of [start, end) into the absolute hours it touches.
+    # Returns (cells, hours): the 0..167 hour-of-week cell and occupied fraction of each hour.
+    first = (start - EPOCH).total_seconds() / 3600
+    last = (end - EPOCH).total_seconds() / 3600
+    absolute = np.arange(np.floor(first), np.ceil(last))
+    hours = np.minimum(absolute + 1, last) - np.maximum(absolute, first)
+
+    absolute = absolute.astype(np.int64)
+    cells = ((absolute // 24 + 3) % 7) * 24 + absolute % 24
+    return cells, hours
+
+
+def fold_occupancy(matrix, start, end):
+    cells, hours = hour_of_week_overlaps(start, end)
+    np.add.at(matrix.reshape(-1), cells, hours)
+
+
+def record_occupancy(lot_id, reservation):
+    # Read-modify-write of the lot's matrix. Callers have already written in this
+    # transaction, so SQLite's write lock keeps concurrent releases from interleaving.
+    row = db.session.get(LotOccupancy, lot_id)
+    if row is None:
+        row = LotOccupancy(lot_id=lot_id, since=reservation.parking_timestamp, hours=np.zeros((7, 24)).tobytes())
+        db.session.add(row)
+
+    matrix = np.frombuffer(row.hours, dtype=np.float64).reshape(7, 24).copy()
+    fold_occupancy(matrix, reservation.parking_timestamp, reservation.leaving_timestamp)
+    row.hours = matrix.tobytes()
+    row.since = min(row.since, reservation.parking_timestamp)
+
+
+def lot_occupancy(lot):
+    # Average occupied spots for each hour of the week, plus utilisation of max_spots
+    row = db.session.get(LotOccupancy, lot.pl_id)
+    if row is None:
+        average = np.zeros((7, 24))
+    else:
+        weeks = max((datetime.now() - row.since).total_seconds() / (7 * 24 * 3600), 1.0)
+        average = np.frombuffer(row.hours, dtype=np.float64).reshape(7, 24) / weeks
+
+    return {
+        'lot_id': lot.pl_id,
+        'lot_name': lot.lot_name,
+        'days': WEEKDAYS,
+        'hours': list(range(24)),
+        'occupancy': np.round(average, 2).tolist(),
+        'utilisation': np.round(average / lot.max_spots, 3).tolist() if lot.max_spots else None,
+    }
+
+
+def record_booking(reservation):
+    # Bookkeeping for a new active reservation, in the booking's transaction
+    bump_data_version('global', user_scope(reservation.user_id))
+    bump_user_stat(reservation.user_id, 'day', reservation.parking_timestamp.strftime('%Y-%m-%d'))
+    bump_user_stat(reservation.user_id, 'status', 'Active')
+
+
+def record_release(reservation, lot_id):
+    # Bookkeeping for an active reservation that has just been released and billed
+    bump_data_version('global', user_scope(reservation.user_id))
+    bump_user_stat(reservation.user_id, 'status', 'Active', -1)
+    bump_user_stat(reservation.user_id, 'status', 'Released')
+    if reservation.parking_cost:
+        bump_user_stat(reservation.user_id, 'lot', lot_id, reservation.parking_cost)
+
+    minutes = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 60
+    bucket = duration_bin(minutes)
+    if bucket is not None:
+        bump_user_stat(reservation.user_id, 'duration', bucket)
+
+    apply_rollups(lot_id, *rollup_increments(reservation))
+    record_occupancy(lot_id, reservation)
+
+
+def release_reservation(reservation, parking_cost=None):
+    # Release an active reservation and free its spot, in the caller's transaction.
+    # Both UPDATEs are conditional, so releasing a reservation twice (a re-POST, or two
+    # requests racing) changes nothing the second time; in particular it can never free
+    # a spot that someone else has booked since. Returns False if it was not active.
+    values = {'status': 'Released', 'leaving_timestamp': datetime.now()}
+    if parking_cost is not None:
+        values['parking_cost'] = parking_cost
+    released = db.session.execute(
+        db.update(Reservation)
+        .where(Reservation.id == reservation.id, Reservation.status == 'Active')
+        .values(**values),
+        execution_options={'synchronize_session': 'evaluate'}
+    ).rowcount
+    if not released:
+        return False
+
+    freed = db.session.execute(
+        db.update(ParkingSpot)
+        .where(ParkingSpot.ps_id == reservation.spot_id, ParkingSpot.status == 'O')
+        .values(status='A')
+        .returning(ParkingSpot.lot_id),
+        execution_options={'synchronize_session': False}
+    ).first()
+    if freed:
+        adjust_lot_counts(freed.lot_id, available=1, occupied=-1)
+    record_release(reservation, reservation.spot.lot_id)
+    return True
+
+
+def sweep_reservations(lot_id=None):
+    # Release and bill every active reservation, in one lot or everywhere, e.g. at
+    # closing time. The status changes are set-based UPDATEs, billing is one
+    # batch_parking_costs() call written back with a single executemany, and the
+    # bookkeeping that record_release() does one row at a time is aggregated
+    # from the released rows and written in bulk.
+    # Returns (number released, total billed).
+    now = datetime.now()
+    in_scope = db.select(ParkingSpot.ps_id)
+    if lot_id is not None:
+        in_scope = in_scope.where(ParkingSpot.lot_id == lot_id)
+
+    lot_of_spot = db.select(ParkingSpot.lot_id).where(
+        ParkingSpot.ps_id == Reservation.spot_id
+    ).scalar_subquery()
+
+    rows = db.session.execute(
+        db.update(Reservation)
+        .where(Reservation.status == 'Active', Reservation.spot_id.in_(in_scope))
+        .values(status='Released', leaving_timestamp=now)
+        .returning(Reservation.id, Reservation.user_id, Reservation.parking_timestamp,
+                   Reservation.leaving_timestamp, lot_of_spot.label('lot_id')),
+        execution_options={'synchronize_session': False}
+    ).all()
+
+    costs = batch_parking_costs([row.lot_id for row in rows], [row.parking_timestamp for row in rows],
+                                [row.leaving_timestamp for row in rows])
+    released = [SimpleNamespace(**row._asdict(), parking_cost=float(cost)) for row, cost in zip(rows, costs)]
+    if released:
+        db.session.execute(db.update(Reservation), [
+            {'id': reservation.id, 'parking_cost': reservation.parking_cost} for reservation in released
+        ])
+
+    spots = db.update(ParkingSpot).where(ParkingSpot.status == 'O')
+    lots = db.update(ParkingLot).where(ParkingLot.occupied_count > 0)
+    if lot_id is not None:
+        spots = spots.where(ParkingSpot.lot_id == lot_id)
+        lots = lots.where(ParkingLot.pl_id == lot_id)
+    db.session.execute(spots.values(status='A'), execution_options={'synchronize_session': False})
+    db.session.execute(lots.values(
+        available_count=ParkingLot.available_count + ParkingLot.occupied_count,
+        occupied_count=0
+    ), execution_options={'synchronize_session': False})
+
+    stats, per_lot = {}, {}
+    for reservation in released:
+        uid = reservation.user_id
+        stats[(uid, 'status', 'Active')] = stats.get((uid, 'status', 'Active'), 0) - 1
+        stats[(uid, 'status', 'Released')] = stats.get((uid, 'status', 'Released'), 0) + 1
+        if reservation.parking_cost:
+            stats[(uid, 'lot', reservation.lot_id)] = stats.get((uid, 'lot', reservation.lot_id), 0) + reservation.parking_cost
+        bucket = duration_bin((reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 60)
+        if bucket is not None:
+            stats[(uid, 'duration', bucket)] = stats.get((uid, 'duration', bucket), 0) + 1
+        per_lot.setdefault(reservation.lot_id, []).append(reservation)
+
+    bump_user_stats(stats)
+    for lot, reservations in per_lot.items():
+        rollups = ({}, {})
+        for reservation in reservations:
+            merge_rollups(rollups, rollup_increments(reservation))
+        apply_rollups(lot, *rollups)
+        for reservation in reservations:
+            record_occupancy(lot, reservation)
+
+    bump_data_version('global', *sorted({user_scope(r.user_id) for r in released}))
+    db.session.commit()
+    return len(released), sum(r.parking_cost or 0 for r in released)
+
+
+def duration_bucket_sql():
+    # (in range, bucket) SQL expressions matching duration_bin() for a reservation's stay
+    stay = durations.stay_microseconds_sql('reservations.parking_timestamp', 'reservations.leaving_timestamp')
+    return (db.literal_column(durations.duration_in_range_sql(stay), db.Boolean),
+            db.literal_column(durations.duration_bucket_sql(stay), db.Integer))
+
+
+def rebuild_user_stats():
+    # Recompute every user's statistics from the reservations table with set-based INSERT ... SELECTs
+    columns = ['user_id', 'kind', 'key', 'value']
+    status = db.case((Reservation.status == 'Active', 'Active'), else_='Released')
+    day = func.date(Reservation.parking_timestamp)
+    in_range, bucket = duration_bucket_sql()
+
+    db.session.execute(db.delete(UserStat))
+    for select in [
+        db.select(Reservation.user_id, db.literal('day'), day, func.count(Reservation.id))
+        .group_by(Reservation.user_id, day),
+
+        db.select(Reservation.user_id, db.literal('status'), status, func.count(Reservation.id))
+        .group_by(Reservation.user_id, status),
+
+        db.select(Reservation.user_id, db.literal('lot'), db.cast(ParkingSpot.lot_id, db.String), func.sum(Reservation.parking_cost))
+        .join(ParkingSpot, Reservation.spot_id == ParkingSpot.ps_id)
+        .where(Reservation.status != 'Active', Reservation.parking_cost > 0)
+        .group_by(Reservation.user_id, ParkingSpot.lot_id),
+
+        db.select(Reservation.user_id, db.literal('duration'), db.cast(bucket, db.String), func.count(Reservation.id))
+        .where(Reservation.status != 'Active', Reservation.leaving_timestamp.is_not(None),
+               in_range)
+        .group_by(Reservation.user_id, bucket),
+    ]:
+        db.session.execute(db.insert(UserStat).from_select(columns, select))
+    db.session.commit()
+
+
+def user_chart_data(user):
+    # Reads only the user's running statistics, never their reservations
+    stats = {}
+    for kind, key, value in db.session.execute(
+        db.select(UserStat.kind, UserStat.key, UserStat.value).where(UserStat.user_id == user.uid)
+    ):
+        stats.setdefault(kind, {})[key] = value
+
+    days = sorted(stats.get('day', {}).items())
+    statuses = stats.get('status', {})
+    durations = stats.get('duration', {})
+    lot_spend = db.session.execute(
+        db.select(ParkingLot.lot_name, UserStat.value)
+        .join(ParkingLot, ParkingLot.pl_id == db.cast(UserStat.key, db.Integer))
+        .where(UserStat.user_id == user.uid, UserStat.kind == 'lot', UserStat.value > 0)
+        .order_by(ParkingLot.pl_id)
+    ).all()
+
+    return {
+        'reservations_per_day': series([d for d, _ in days], [int(count) for _, count in days]),
+        'revenue_per_lot': series([name for name, _ in lot_spend], [total for _, total in lot_spend]),
+        'active_split': series(['Active', 'Released'], [int(statuses.get('Active', 0)), int(statuses.get('Released', 0))]),
+        'duration_histogram': {
+            'bins': DURATION_BINS,
+            'values': [int(durations.get(str(i), 0)) for i in range(len(DURATION_BINS) - 1)]
+        },
+    }
+
+
+def parse_date_range():
+    # Optional ?start=YYYY-MM-DD&end=YYYY-MM-DD filter; malformed dates are ignored
+    def parse(name):
+        try:
+            return date.fromisoformat(request.args.get(name, ''))
+        except ValueError:
+            return None
+    return parse('start'), parse('end')
+
+
+def in_date_range(column, start=None, end=None):
+    # Half-open bounds on a timestamp column, so the filter can use its index
+    conditions = []
+    if start:
+        conditions.append(column >= datetime.combine(start, datetime.min.time()))
+    if end:
+        conditions.append(column < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return conditions
+
+
+def superuser_chart_data(start=None, end=None):
+    # Every series is a GROUP BY in SQLite; only the aggregated rows reach Python
+    in_range = in_date_range(Reservation.parking_timestamp, start, end)
+
+    # Spot availability comes from the per-lot counters, so it is not date filtered
+    available_spots, occupied_spots = db.session.execute(db.select(
+        func.coalesce(func.sum(ParkingLot.available_count), 0),
+        func.coalesce(func.sum(ParkingLot.occupied_count), 0)
+    )).one()
+
+    day = func.date(Reservation.parking_timestamp)
+    daily = db.session.execute(
+        db.select(day, func.count(Reservation.id)).where(*in_range).group_by(day).order_by(day)
+    ).all()
+
+    # Revenue and occupancy trends come from the daily rollups instead of the raw reservations
+    rollup_range = []
+    if start:
+        rollup_range.append(LotDailyRollup.day >= start)
+    if end:
+        rollup_range.append(LotDailyRollup.day <= end)
+
+    lot_revenue = db.session.execute(
+        db.select(ParkingLot.lot_name, func.sum(LotDailyRollup.revenue))
+        .join(ParkingLot, LotDailyRollup.lot_id == ParkingLot.pl_id)
+        .where(*rollup_range)
+        .group_by(ParkingLot.pl_id, ParkingLot.lot_name)
+        .having(func.sum(LotDailyRollup.revenue) > 0)
+        .order_by(ParkingLot.pl_id)
+    ).all()
+
+    trends = db.session.execute(
+        db.select(LotDailyRollup.day, func.sum(LotDailyRollup.occupied_hours), func.sum(LotDailyRollup.revenue))
+        .where(*rollup_range)
+        .group_by(LotDailyRollup.day)
+        .order_by(LotDailyRollup.day)
+    ).all()
+
+    stay_in_range, bucket = duration_bucket_sql()
+    histogram = [0] * (len(DURATION_BINS) - 1)
+    for index, count in db.session.execute(
+        db.select(bucket, func.count(Reservation.id))
+        .where(Reservation.leaving_timestamp.is_not(None),
+               stay_in_range, *in_range)
+        .group_by(bucket)
+    ):
+        histogram[index] = count
+
+    return {
+        'availability': series(['Available', 'Occupied'], [available_spots, occupied_spots]),
+        'reservations_per_day': series([d for d, _ in daily], [c for _, c in daily]),
+        'revenue_per_lot': series([name for name, _ in lot_revenue], [total for _, total in lot_revenue]),
+        'duration_histogram': {'bins': DURATION_BINS, 'values': histogram},
+        'occupancy_per_day': series([d.isoformat() for d, _, _ in trends], [round(h, 2) for _, h, _ in trends]),
+        'revenue_per_day': series([d.isoformat() for d, _, _ in trends], [r for _, _, r in trends]),
+    }
+
+
+# PNG fallback renderers for the series above
+
+def new_figure():
+    # A standalone Figure rather than pyplot, whose global current-figure state is not
+    # safe across request threads. matplotlib takes longer to import than the rest of
+    # the app together, so it is loaded on the first chart drawn rather than at startup.
+    from matplotlib.figure import Figure
+    fig = Figure()
+    return fig, fig.subplots()
+
+
+def draw_line_chart(data, xlabel, ylabel, title, color):
+    fig, ax = new_figure()
+    ax.plot(data['labels'], data['values'], marker='o', color=color)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+
+def draw_bar_chart(data, xlabel, ylabel, title, color):
+    fig, ax = new_figure()
+    ax.bar(data['labels'], data['values'], color=color, edgecolor='black', width=0.4)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+
+def draw_pie_chart(data, title, colors, shadow=False):
+    fig, ax = new_figure()
+    explode = (0.1, 0)  # "explode" the first slice
+    ax.pie(data['values'], labels=data['labels'], autopct='%1.1f%%', startangle=90,
+           colors=colors, explode=explode, shadow=shadow)
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+
+def draw_histogram(data, xlabel, ylabel, title, color):
+    fig, ax = new_figure()
+    bins = data['bins']
+    ax.hist(bins[:-1], bins=bins, weights=data['values'], color=color, edgecolor='black')
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    fig.tight_layout()
+    return fig
+
+
+# In-process copy of the lot directory (lot metadata and its search index). Each worker keeps
+# its own copy and reloads it when the 'lots' data version in the database moves,
+# so a lot change made through one gunicorn worker is seen by all of them.
+# search_keys/search_ids are a sorted prefix index over pincodes, lot names and the
+# words of lot names; search_ids[i] is the lot that search_keys[i] came from.
+# grid buckets the lots that have coordinates by GRID_CELL_DEGREES square cells.
+# tariffs holds compiled pricing tables, built the first time a lot is billed.
+# A reload builds a whole new LotDirectory and swaps the one 'current' reference, so a
+# reader holding a directory always sees lots, search index and grid from the same load.
+LotDirectory = namedtuple('LotDirectory', ('version', 'lots', 'search_keys', 'search_ids', 'grid', 'centres',
+                                           'tariffs'))
+_lot_directory = {'current': None}
+_lot_directory_lock = threading.Lock()
+
+LOT_SEARCH_LIMIT = 10
+NEAREST_LOTS_LIMIT = 5
+GRID_CELL_DEGREES = 0.05  # about 5.5 km of latitude
+KM_PER_DEGREE = 111.195
+NEAREST_CANDIDATE_BATCH = 64  # lots gathered from the grid per counter lookup
+NEAREST_MAX_KM = 25.0
+
+
+def lot_directory():
+    # Looked up once per request, so every use in a request shares one directory
+    # and the version query runs once
+    if has_request_context() and 'lot_directory' in g:
+        return g.lot_directory
+    directory = load_lot_directory()
+    if has_request_context():
+        g.lot_directory = directory
+    return directory
+
+
+def load_lot_directory():
+    version = data_version('lots')
+    directory = _lot_directory['current']
+    if directory is None or directory.version != version:
+        with _lot_directory_lock:
+            directory = _lot_directory['current']
+            if directory is None or directory.version != version:
+                lots = {}
+                for lot in db.session.execute(db.select(
+                    ParkingLot.pl_id, ParkingLot.lot_name, ParkingLot.address,
+                    ParkingLot.pin_code, ParkingLot.price_per_hour, ParkingLot.max_spots,
+                    ParkingLot.latitude, ParkingLot.longitude, ParkingLot.tariff
+                ).order_by(ParkingLot.pl_id)):
+                    lots[lot.pl_id] = lot._asdict()
+
+                grid, positions = {}, {}
+                for lot in lots.values():
+                    if lot['latitude'] is not None and lot['longitude'] is not None:
+                        grid.setdefault(grid_cell(lot['latitude'], lot['longitude']), []).append(lot['pl_id'])
+                        positions.setdefault(lot['pin_code'], []).append((lot['latitude'], lot['longitude']))
+
+                # Mean position of each pincode's lots, the origin for "nearest to this pincode"
+                centres = {}
+                for pin_code, points in positions.items():
+                    centres[pin_code] = (sum(p[0] for p in points) / len(points),
+                                         sum(p[1] for p in points) / len(points))
+
+                entries = set()
+                for lot in lots.values():
+                    name = lot['lot_name'].strip().lower()
+                    entries.add((lot['pin_code'].strip().lower(), lot['pl_id']))
+                    entries.add((name, lot['pl_id']))
+                    for word in name.split():
+                        entries.add((word, lot['pl_id']))
+                entries = sorted(entries)
+
+                directory = LotDirectory(
+                    version=version,
+                    lots=lots,
+                    search_keys=[key for key, _ in entries],
+                    search_ids=[pl_id for _, pl_id in entries],
+                    grid=grid,
+                    centres=centres,
+                    tariffs={}
+                )
+                _lot_directory['current'] = directory
+    return directory
+
+
+def lot_tariff(lot_id):
+    # Compiled pricing tables for the lot, cached with the directory
+    directory = lot_directory()
+    tariff = directory.tariffs.get(lot_id)
+    if tariff is None:
+        lot = directory.lots[lot_id]
+        tariff = pricing.compile_tariff(lot['price_per_hour'], pricing.parse_schedule(lot['tariff']))
+        directory.tariffs[lot_id] = tariff
+    return tariff
+
+
+def parking_cost(lot_id, start, end):
+    return pricing.interval_cost(lot_tariff(lot_id), start, end)
+
+
+def batch_parking_costs(lot_ids, starts, ends):
+    # Bill many stays at once: one vectorized pricing call per distinct lot.
+    # Returns a float64 array aligned with the inputs.
+    lot_ids = np.asarray(lot_ids)
+    starts, ends = np.asarray(starts, dtype=object), np.asarray(ends, dtype=object)
+    costs = np.zeros(len(lot_ids))
+    for lot_id in np.unique(lot_ids):
+        rows = lot_ids == lot_id
+        costs[rows] = pricing.batch_costs(lot_tariff(int(lot_id)), starts[rows], ends[rows])
+    return costs
+
+
+def prefix_matches(directory, query, limit):
+    # Prefix lookup: bisect to the first key >= query and walk forward while keys
+    # still start with it. Returns up to `limit` distinct lot ids.
+    query = query.strip().lower()
+    if not query:
+        return []
+
+    keys, ids = directory.search_keys, directory.search_ids
+    matched = []
+    i = bisect_left(keys, query)
+    while i < len(keys) and keys[i].startswith(query) and len(matched) < limit:
+        if ids[i] not in matched:
+            matched.append(ids[i])
+        i += 1
+    return matched
+
+
+def resolve_pincode(query):
+    # The search boxes accept a lot name too; an exact pincode sorts first, anything
+    # else falls back to the pincode of the best-matching lot
+    directory = lot_directory()
+    matched = prefix_matches(directory, query, 1)
+    if not matched:
+        return query
+    return directory.lots[matched[0]]['pin_code']
+
+
+def search_lots(query, limit=LOT_SEARCH_LIMIT):
+    # Live spot counters are read for the matched lots only
+    directory = lot_directory()
+    matched = prefix_matches(directory, query, limit)
+    if not matched:
+        return []
+
+    counts = dict((row.pl_id, row) for row in db.session.execute(db.select(
+        ParkingLot.pl_id, ParkingLot.available_count, ParkingLot.occupied_count
+    ).where(ParkingLot.pl_id.in_(matched))))
+
+    results = []
+    for pl_id in matched:
+        if pl_id not in counts:
+            continue
+        lot = directory.lots[pl_id]
+        results.append({
+            'pl_id': pl_id,
+            'lot_name': lot['lot_name'],
+            'pin_code': lot['pin_code'],
+            'address': lot['address'],
+            'price_per_hour': lot['price_per_hour'],
+            'available_spots': counts[pl_id].available_count,
+            'occupied_spots': counts[pl_id].occupied_count
+        })
+    return results
+
+
+def grid_cell(latitude, longitude):
+    return (math.floor(latitude / GRID_CELL_DEGREES), math.floor(longitude / GRID_CELL_DEGREES))
+
+
+def distance_km(lat1, lng1, lat2, lng2):
+    # Haversine great-circle distance
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * KM_PER_DEGREE * math.degrees(math.asin(math.sqrt(a)))
+
+
+def grid_rings(grid, row, col):
+    # Yields (ring, occupied cells on that ring) outwards from (row, col). Rings are
+    # enumerated cell by cell while that is cheaper than scanning the grid; past
+    # that (a sparse grid or a far-away origin) the rest are bucketed from the grid.
+    ring = 0
+    while (2 * ring + 1) ** 2 <= len(grid):
+        if ring == 0:
+            perimeter = [(row, col)]
+        else:
+            perimeter = [(row - ring, c) for c in range(col - ring, col + ring + 1)]
+            perimeter += [(row + ring, c) for c in range(col - ring, col + ring + 1)]
+            perimeter += [(r, col - ring) for r in range(row - ring + 1, row + ring)]
+            perimeter += [(r, col + ring) for r in range(row - ring + 1, row + ring)]
+        yield ring, [cell for cell in perimeter if cell in grid]
+        ring += 1
+
+    remaining = {}
+    for r, c in grid:
+        distance = max(abs(r - row), abs(c - col))
+        if distance >= ring:
+            remaining.setdefault(distance, []).append((r, c))
+    for distance in sorted(remaining):
+        yield distance, remaining[distance]
+
+
+def nearest_free_lots(latitude, longitude, limit=NEAREST_LOTS_LIMIT, exclude=(), max_km=NEAREST_MAX_KM):
+    # Walk the grid in rings of cells around the origin. Anything outside ring r is
+    # at least r cells away, so once the limit-th nearest free lot is closer than
+    # that bound no further ring can change the answer. Free spots are checked
+    # against the live counters in batches of candidates gathered ring by ring.
+    # Lots further than max_km are not worth driving to and are never returned.
+    directory = lot_directory()
+    grid, lots = directory.grid, directory.lots
+    if not grid:
+        return []
+
+    def free_lots(candidates):
+        if not candidates:
+            return []
+        rows = []
+        for lot in db.session.execute(db.select(
+            ParkingLot.pl_id, ParkingLot.available_count
+        ).where(ParkingLot.pl_id.in_(candidates), ParkingLot.available_count > 0)):
+            info = lots[lot.pl_id]
+            distance = round(distance_km(latitude, longitude, info['latitude'], info['longitude']), 1)
+            rows.append((distance, info['price_per_hour'], lot.pl_id, lot.available_count))
+        return rows
+
+    found, pending = [], []
+    for ring, cells in grid_rings(grid, *grid_cell(latitude, longitude)):
+        pending.extend(pl_id for cell in cells for pl_id in grid[cell] if pl_id not in exclude)
+        if len(pending) < NEAREST_CANDIDATE_BATCH and ring * GRID_CELL_DEGREES * KM_PER_DEGREE <= max_km:
+            continue
+        found.extend(free_lots(pending))
+        found.sort()
+        pending = []
+
+        # Longitude degrees shrink towards the poles, so take the bound at the ring's edge
+        edge_latitude = min(abs(latitude) + ring * GRID_CELL_DEGREES, 89.0)
+        bound = ring * GRID_CELL_DEGREES * KM_PER_DEGREE * math.cos(math.radians(edge_latitude))
+        if bound > max_km or (len(found) >= limit and found[limit - 1][0] <= bound):
+            break
+    else:
+        found.extend(free_lots(pending))
+        found.sort()
+
+    found = [lot for lot in found if lot[0] <= max_km]
+
+    results = []
+    for distance, price, pl_id, available in found[:limit]:
+        lot = lots[pl_id]
+        results.append({
+            'pl_id': pl_id,
+            'lot_name': lot['lot_name'],
+            'pin_code': lot['pin_code'],
+            'address': lot['address'],
+            'price_per_hour': price,
+            'available_spots': available,
+            'distance_km': distance
+        })
+    return results
+
+
+def parse_coordinates(latitude, longitude):
+    # Form/query values to a (lat, lng) pair; blank means the lot has no position
+    if not latitude and not longitude:
+        return None, None
+    latitude, longitude = float(latitude), float(longitude)
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('coordinates out of range')
+    return latitude, longitude
+
+
+def invalidate_lot_directory():
+    # Called in the same transaction as any lot add/edit/delete
+    bump_data_version('global', 'lots')
+    g.pop('lot_directory', None)  # the rest of this request sees the change too
+
+
+def adjust_lot_counts(lot_id, available=0, occupied=0):
+    # Set-based increment so concurrent bookings never overwrite each other's counts.
+    # Runs inside the caller's transaction; the caller commits.
+    ParkingLot.query.filter_by(pl_id=lot_id).update({
+        ParkingLot.available_count: ParkingLot.available_count + available,
+        ParkingLot.occupied_count: ParkingLot.occupied_count + occupied
+    }, synchronize_session=False)
+
+
+def reconcile_lot_counts():
+    # Rebuild the counters of every lot from ParkingSpot in one UPDATE
+    def spot_count(status):
+        return db.select(func.count(ParkingSpot.ps_id)).where(
+            ParkingSpot.lot_id == ParkingLot.pl_id, ParkingSpot.status == status
+        ).scalar_subquery()
+
+    db.session.execute(db.update(ParkingLot).values(
+        available_count=spot_count('A'),
+        occupied_count=spot_count('O')
+    ))
+    db.session.commit()
+
+
+def provision_spots(lot_id, first_number, count):
+    # Create `count` available spots numbered from first_number with one
+    # INSERT ... SELECT over a recursive number series, instead of one ORM
+    # object per spot. Runs inside the caller's transaction.
+    if count <= 0:
+        return 0
+
+    seq = db.select(db.literal(first_number).label('n')).cte('seq', recursive=True)
+    seq = seq.union_all(db.select(seq.c.n + 1).where(seq.c.n < first_number + count - 1))
+
+    db.session.execute(db.insert(ParkingSpot).from_select(
+        ['lot_id', 'status', 'spot_number'],
+        db.select(db.literal(int(lot_id)), db.literal('A'), seq.c.n)
+    ))
+    return count
+
+
+def remove_free_spots(lot_id, count):
+    # Delete up to `count` available spots, highest spot_number first, in one statement.
+    # Occupied spots and spots with an upcoming hold are never removed.
+    # Returns how many spots were deleted.
+    if count <= 0:
+        return 0
+
+    held = db.select(SpotHold.id).where(
+        SpotHold.spot_id == ParkingSpot.ps_id, SpotHold.status == 'Held', SpotHold.end_time > datetime.now()
+    ).exists()
+    removable = db.select(ParkingSpot.ps_id).where(
+        ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A', ~held
+    ).order_by(ParkingSpot.spot_number.desc()).limit(count)
+
+    result = db.session.execute(
+        db.delete(ParkingSpot).where(ParkingSpot.ps_id.in_(removable)),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
+
+def lots_with_first_free_spot(pin_code):
+    # One query per pincode search: lot columns, counters and the first spot a walk-in can take
+    first_free = db.select(ParkingSpot).where(
+        ParkingSpot.lot_id == ParkingLot.pl_id, ParkingSpot.status == 'A', walk_in_allowed()
+    ).order_by(ParkingSpot.spot_number).limit(1)
+
+    return db.session.execute(db.select(
+        ParkingLot.pl_id,
+        ParkingLot.lot_name,
+        ParkingLot.address,
+        ParkingLot.price_per_hour,
+        ParkingLot.available_count,
+        ParkingLot.occupied_count,
+        first_free.with_only_columns(ParkingSpot.ps_id).scalar_subquery().label('first_spot_id'),
+        first_free.with_only_columns(ParkingSpot.spot_number).scalar_subquery().label('first_spot_number')
+    ).where(ParkingLot.pin_code == pin_code)).all()
+
+
+def claim_spot(lot_id=None, spot_id=None, until=None):
+    # Pick and mark a free spot as occupied with one conditional UPDATE, so two
+    # concurrent bookings can never both win the same spot.
+    # With spot_id the claim only succeeds if that exact spot is still free;
+    # otherwise the lowest-numbered free spot in lot_id is taken. Spots held for
+    # someone before `until` (default: WALK_IN_HOLD_HORIZON from now) are skipped.
+    # Returns (ps_id, lot_id, spot_number) of the claimed spot, or None.
+    if spot_id is not None:
+        target = ParkingSpot.ps_id == spot_id
+    else:
+        first_free = db.select(ParkingSpot.ps_id).where(
+            ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A', walk_in_allowed(until)
+        ).order_by(ParkingSpot.spot_number).limit(1).scalar_subquery()
+        target = ParkingSpot.ps_id == first_free
+
+    claimed = db.session.execute(
+        db.update(ParkingSpot)
+        .where(target, ParkingSpot.status == 'A', walk_in_allowed(until))
+        .values(status='O')
+        .returning(ParkingSpot.ps_id, ParkingSpot.lot_id, ParkingSpot.spot_number),
+        execution_options={'synchronize_session': False}
+    ).first()
+
+    if claimed:
+        adjust_lot_counts(claimed.lot_id, available=-1, occupied=1)
+    return claimed
+
+
+def is_lock_error(error):
+    return 'database is locked' in str(error.orig) or 'database table is locked' in str(error.orig)
+
+
+def retry_on_lock(view):
+    # Rerun a booking/release view when SQLite reports the database locked even after
+    # the busy timeout, e.g. a WAL snapshot that went stale before its first write.
+    # Each attempt starts from a rolled-back session, so it re-reads everything.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        attempts = current_app.config['LOCK_RETRY_ATTEMPTS']
+        for attempt in range(attempts + 1):
+            try:
+                return view(*args, **kwargs)
+            except OperationalError as error:
+                db.session.rollback()
+                if attempt == attempts or not is_lock_error(error):
+                    raise
+                time.sleep(current_app.config['LOCK_RETRY_BASE_DELAY'] * 2 ** attempt * random.uniform(0.5, 1.5))
+    return wrapper
+
+
+VEHICLE_NUMBER_SEPARATORS = re.compile(r'[^0-9A-Za-z]')
+
+# Matches the partial unique index's WHERE literally; SQLite only uses a partial
+# index when the query repeats its condition, and a bound 'Active' doesn't count
+ACTIVE_RESERVATION = Reservation.status == db.literal_column("'Active'")
+
+
+def normalize_vehicle_number(vehicle_number):
+    # 'mh12 ab-1234' -> 'MH12AB1234', so spacing and case variants are the same plate
+    return VEHICLE_NUMBER_SEPARATORS.sub('', vehicle_number or '').upper()
+
+
+def vehicle_is_active(vehicle_number):
+    # One seek on ux_reservations_active_vehicle; expects a normalized number
+    return db.session.execute(db.select(Reservation.id).where(
+        Reservation.vehicle_number == vehicle_number, ACTIVE_RESERVATION
+    ).limit(1)).first() is not None
+
+
+def book_spot(user, vehicle_number, lot_id=None, spot_id=None, until=None):
+    # Claim a spot and insert its reservation in a single transaction.
+    # Returns the new Reservation, or None when no spot could be claimed or the
+    # vehicle was booked by a concurrent request since the caller checked it.
+    claimed = claim_spot(lot_id=lot_id, spot_id=spot_id, until=until)
+    if not claimed:
+        db.session.rollback()
+        return None
+
+    new_reservation = Reservation(
+        parking_timestamp=datetime.now(),
+        spot_id=claimed.ps_id,
+        user_id=user.uid,
+        status="Active",
+        vehicle_number=vehicle_number
+    )
+    db.session.add(new_reservation)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    record_booking(new_reservation)
+    db.session.commit()
+    return new_reservation
+
+
+# A walk-in's leaving time is unknown, so walk-ins stay off spots held for anyone
+# within this horizon, and a hold starting within it needs the spot free right now
+WALK_IN_HOLD_HORIZON = timedelta(hours=2)
+MAX_HOLD_DURATION = timedelta(hours=24)
+MAX_HOLD_ADVANCE = timedelta(days=30)
+HOLD_CHECKIN_EARLY = timedelta(minutes=15)
+HOLD_CLAIM_ATTEMPTS = 3
+
+# Per-worker interval index of upcoming holds: lot_id -> {'version', 'spots'} where
+# spots maps spot_id -> (starts, ends), both sorted, of that spot's disjoint windows.
+# Reloaded when the lot's 'holds:<lot_id>' data version moves.
+_hold_index = {}
+_hold_index_lock = threading.Lock()
+
+
+def hold_scope(lot_id):
+    return f'holds:{lot_id}'
+
+
+def held_window_free_sql(match, start, end):
+    # No 'Held' window among the holds matching `match` overlaps [start, end). Those
+    # windows are disjoint, so only the latest one starting before `end` can overlap:
+    # a single index seek rather than a scan.
+    latest_end = db.select(SpotHold.end_time).where(
+        match, SpotHold.status == 'Held', SpotHold.start_time < end
+    ).order_by(SpotHold.start_time.desc()).limit(1).scalar_subquery()
+    return func.coalesce(latest_end, start) <= start
+
+
+def hold_free_sql(spot_column, start, end):
+    # No 'Held' window on the spot overlaps [start, end); seeks on ix_spot_holds_spot_id_status_start_time
+    return held_window_free_sql(SpotHold.spot_id == spot_column, start, end)
 
-db.create_all()
+
+def vehicle_hold_free_sql(vehicle_number, start, end):
+    # The vehicle has no 'Held' window overlapping [start, end); seeks on
+    # ix_spot_holds_vehicle_number_status_start_time
+    return held_window_free_sql(SpotHold.vehicle_number == vehicle_number, start, end)
+
+
+def vehicle_is_held(vehicle_number, start, end):
+    return not db.session.execute(db.select(vehicle_hold_free_sql(vehicle_number, start, end))).scalar()
+
+
+def walk_in_allowed(until=None):
+    # No other hold on the spot between now and `until` (default: the horizon)
+    now = datetime.now()
+    return hold_free_sql(ParkingSpot.ps_id, now, until or now + WALK_IN_HOLD_HORIZON)
+
+
+def starts_soon(start):
+    return start < datetime.now() + WALK_IN_HOLD_HORIZON
+
+
+def lot_hold_index(lot_id):
+    version = data_version(hold_scope(lot_id))
+    cached = _hold_index.get(lot_id)
+    if cached is None or cached['version'] != version:
+        with _hold_index_lock:
+            spots = {}
+            for hold in db.session.execute(db.select(
+                SpotHold.spot_id, SpotHold.start_time, SpotHold.end_time
+            ).join(ParkingSpot, SpotHold.spot_id == ParkingSpot.ps_id).where(
+                ParkingSpot.lot_id == lot_id, SpotHold.status == 'Held', SpotHold.end_time > datetime.now()
+            ).order_by(SpotHold.spot_id, SpotHold.start_time)):
+                starts, ends = spots.setdefault(hold.spot_id, ([], []))
+                starts.append(hold.start_time)
+                ends.append(hold.end_time)
+            cached = {'version': version, 'spots': spots}
+            _hold_index[lot_id] = cached
+    return cached['spots']
+
+
+def window_overlaps(windows, start, end):
+    # Same test as hold_free_sql, on the in-memory index: O(log n) per spot
+    starts, ends = windows
+    i = bisect_left(starts, end) - 1
+    return i >= 0 and ends[i] > start
+
+
+def free_spots_between(lot_id, start, end):
+    # Spots in the lot that can be held for [start, end), lowest number first
+    holds = lot_hold_index(lot_id)
+    needs_free_now = starts_soon(start)
+
+    free = []
+    for spot in db.session.execute(db.select(
+        ParkingSpot.ps_id, ParkingSpot.spot_number, ParkingSpot.status
+    ).where(ParkingSpot.lot_id == lot_id).order_by(ParkingSpot.spot_number)):
+        if needs_free_now and spot.status != 'A':
+            continue
+        if spot.ps_id in holds and window_overlaps(holds[spot.ps_id], start, end):
+            continue
+        free.append(spot)
+    return free
+
+
+def hold_spot(user, vehicle_number, lot_id, start, end):
+    # Hold the first spot the index reports free. The INSERT repeats the overlap
+    # tests in SQL, so a hold taken by another worker since the index was loaded
+    # makes it insert nothing and the next candidate is tried.
+    # Returns (hold id, spot_number), or None when no spot could be held.
+    for spot in free_spots_between(lot_id, start, end)[:HOLD_CLAIM_ATTEMPTS]:
+        conditions = [ParkingSpot.ps_id == spot.ps_id, hold_free_sql(ParkingSpot.ps_id, start, end),
+                      vehicle_hold_free_sql(vehicle_number, start, end)]
+        if starts_soon(start):
+            conditions.append(ParkingSpot.status == 'A')
+
+        held = db.session.execute(
+            db.insert(SpotHold).from_select(
+                ['spot_id', 'user_id', 'vehicle_number', 'start_time', 'end_time', 'status'],
+                db.select(
+                    ParkingSpot.ps_id,
+                    db.literal(user.uid),
+                    db.literal(vehicle_number),
+                    db.literal(start, db.DateTime),
+                    db.literal(end, db.DateTime),
+                    db.literal('Held')
+                ).where(*conditions)
+            ).returning(SpotHold.id)
+        ).first()
+
+        if held:
+            bump_data_version(hold_scope(lot_id))
+            db.session.commit()
+            return held.id, spot.spot_number
+
+    db.session.rollback()
+    return None
+
+
+def parse_hold_window(start, end):
+    # datetime-local form values to a validated (start, end), or raise ValueError
+    try:
+        start, end = datetime.fromisoformat(start), datetime.fromisoformat(end)
+    except (TypeError, ValueError):
+        raise ValueError('Please enter a valid time window.')
+    now = datetime.now()
+    if start < now - timedelta(minutes=1) or end <= start:
+        raise ValueError('The window must start now or later and end after it starts.')
+    if end - start > MAX_HOLD_DURATION:
+        raise ValueError('A spot can be held for at most 24 hours.')
+    if start > now + MAX_HOLD_ADVANCE:
+        raise ValueError('Spots can be held at most 30 days ahead.')
+    return start, end
+
+
+# Per-worker cache of account identities: uid -> (expires_at, UserIdentity, or None for
+# no such account). Every page looks up the account it acts as, so the cache saves that
+# query on nearly every request. This worker drops an entry as soon as it commits a
+# change to the account; changes made through other workers are picked up when the
+# entry expires after USER_CACHE_TTL seconds. The password is never cached.
+# 'generation' moves on every invalidation, so a row read before one isn't stored after it.
+USER_IDENTITY_FIELDS = ('uid', 'username', 'name', 'phone', 'address', 'pincode', 'is_superUser',
+                        'max_active_reservations')
+UserIdentity = namedtuple('UserIdentity', USER_IDENTITY_FIELDS)
+_user_cache = {'generation': 0, 'users': {}}
+_user_cache_lock = threading.Lock()
+
+
+def user_identity(uid):
+    now = time.monotonic()
+    cached = _user_cache['users'].get(uid)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    generation = _user_cache['generation']
+    row = db.session.execute(
+        db.select(*(getattr(User, field) for field in USER_IDENTITY_FIELDS)).where(User.uid == uid)
+    ).first()
+    identity = UserIdentity(*row) if row else None
+    with _user_cache_lock:
+        if _user_cache['generation'] == generation:
+            _user_cache['users'][uid] = (now + current_app.config['USER_CACHE_TTL'], identity)
+    return identity
+
+
+def invalidate_user(uid):
+    # Called after the change to the account has been committed
+    with _user_cache_lock:
+        _user_cache['generation'] += 1
+        _user_cache['users'].pop(uid, None)
+
+
+def acting_user():
+    # The logged-in account from the session cookie, looked up once per request
+    if 'acting_user' not in g:
+        uid = session.get('uid')
+        g.acting_user = user_identity(uid) if uid is not None else None
+    return g.acting_user
+
+
+def login_required(view):
+    # Pages act as the account in the session. The uid that some URLs still carry is
+    # only kept so existing links work; it never decides whose data is shown.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if acting_user() is None:
+            flash("Please log in to continue.")
+            return redirect('/login')
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def reservation_limit(user):
+    if user.max_active_reservations is not None:
+        return user.max_active_reservations
+    return current_app.config['MAX_ACTIVE_RESERVATIONS']
+
+
+def bookings_in_use(user):
+    # Active reservations plus holds that haven't ended, both counted against reservation_limit
+    active = db.select(func.count()).where(
+        Reservation.user_id == user.uid, Reservation.status == 'Active'
+    ).scalar_subquery()
+    held = db.select(func.count()).where(
+        SpotHold.user_id == user.uid, SpotHold.status == 'Held', SpotHold.end_time > datetime.now()
+    ).scalar_subquery()
+    return db.session.execute(db.select(active + held)).scalar()
+
+
+def claim_spots(lot_id, count):
+    # Bulk claim_spot: mark up to `count` free spots in the lot occupied with one
+    # conditional UPDATE. Returns the claimed (ps_id, lot_id, spot_number) rows,
+    # lowest spot number first; fewer than `count` when the lot runs out.
+    if count <= 0:
+        return []
+
+    free = db.select(ParkingSpot.ps_id).where(
+        ParkingSpot.lot_id == lot_id, ParkingSpot.status == 'A', walk_in_allowed()
+    ).order_by(ParkingSpot.spot_number).limit(count)
+
+    claimed = db.session.execute(
+        db.update(ParkingSpot)
+        .where(ParkingSpot.ps_id.in_(free), ParkingSpot.status == 'A')
+        .values(status='O')
+        .returning(ParkingSpot.ps_id, ParkingSpot.lot_id, ParkingSpot.spot_number),
+        execution_options={'synchronize_session': False}
+    ).all()
+
+    if claimed:
+        adjust_lot_counts(lot_id, available=-len(claimed), occupied=len(claimed))
+    return sorted(claimed, key=lambda spot: spot.spot_number)
+
+
+def book_fleet(user, vehicle_numbers, lot_id):
+    # Book a spot in one lot for each vehicle, in a single transaction.
+    # Every vehicle is checked up front (blank, repeated in the request, already
+    # parked, over the account limit); the rest share one bulk claim.
+    # Returns one {'vehicle_number', 'status', 'spot_number'} dict per input vehicle,
+    # status being booked, invalid, duplicate, already_active, over_limit or no_spot.
+    attempts = current_app.config['LOCK_RETRY_ATTEMPTS']
+    for attempt in range(attempts + 1):
+        try:
+            return claim_fleet(user, vehicle_numbers, lot_id)
+        except IntegrityError:
+            # A vehicle was booked by a concurrent request after the checks. Nothing
+            # has been kept, so start over; it now shows up as already_active.
+            db.session.rollback()
+            if attempt == attempts:
+                raise
+
+
+def claim_fleet(user, vehicle_numbers, lot_id):
+    # One attempt of book_fleet; raises IntegrityError when a vehicle got booked meanwhile
+    results = [{'vehicle_number': normalize_vehicle_number(number), 'status': None, 'spot_number': None}
+               for number in vehicle_numbers]
+
+    wanted = {result['vehicle_number'] for result in results if result['vehicle_number']}
+    already_active = set(db.session.execute(db.select(Reservation.vehicle_number).where(
+        Reservation.vehicle_number.in_(wanted), ACTIVE_RESERVATION
+    )).scalars())
+    remaining = reservation_limit(user) - bookings_in_use(user)
+
+    accepted, seen = [], set()
+    for result in results:
+        number = result['vehicle_number']
+        if not number:
+            result['status'] = 'invalid'
+        elif number in seen:
+            result['status'] = 'duplicate'
+        elif number in already_active:
+            result['status'] = 'already_active'
+        elif len(accepted) >= remaining:
+            result['status'] = 'over_limit'
+        else:
+            accepted.append(result)
+        seen.add(number)
+
+    claimed = claim_spots(lot_id, len(accepted))
+    now = datetime.now()
+    for result, spot in zip(accepted, claimed):
+        reservation = Reservation(
+            parking_timestamp=now,
+            spot_id=spot.ps_id,
+            user_id=user.uid,
+            status="Active",
+            vehicle_number=result['vehicle_number']
+        )
+        db.session.add(reservation)
+        result.update(status='booked', spot_number=spot.spot_number)
+    for result in accepted[len(claimed):]:
+        result['status'] = 'no_spot'
+
+    db.session.flush()
+
+    if claimed:
+        bump_data_version('global', user_scope(user.uid))
+        bump_user_stat(user.uid, 'day', now.strftime('%Y-%m-%d'), len(claimed))
+        bump_user_stat(user.uid, 'status', 'Active', len(claimed))
+        db.session.commit()
+    else:
+        db.session.rollback()
+    return results
+
+
+HISTORY_PAGE_SIZE = 20
+USERS_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+
+def page_size(default):
+    # Page size from ?per_page=, clamped so a client can't ask for the whole table
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, MAX_PAGE_SIZE))
+
+
+def encode_cursor(*values):
+    return '~'.join(v.isoformat() if isinstance(v, datetime) else str(v) for v in values)
+
+
+def keyset_page(stmt, keys, per_page, after=None, before=None, descending=False):
+    # Keyset (seek) pagination: filter on the sort key instead of using OFFSET,
+    # so every page costs one index range scan however deep it is.
+    # `after`/`before` are the key values of the last/first row of the page the
+    # client came from. Returns (rows, next_cursor, prev_cursor).
+    key = db.tuple_(*keys) if len(keys) > 1 else keys[0]
+    backwards = before is not None
+
+    if after is not None:
+        stmt = stmt.where(key < after if descending else key > after)
+    if backwards:
+        stmt = stmt.where(key > before if descending else key < before)
+
+    newest_first = descending != backwards
+    stmt = stmt.order_by(*[k.desc() if newest_first else k.asc() for k in keys]).limit(per_page + 1)
+
+    rows = db.session.execute(stmt).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    def cursor_of(row):
+        return encode_cursor(*[row._mapping[k] for k in keys])
+
+    has_next = True if backwards else has_more
+    has_prev = has_more if backwards else after is not None
+    next_cursor = cursor_of(rows[-1]) if rows and has_next else None
+    prev_cursor = cursor_of(rows[0]) if rows and has_prev else None
+    return rows, next_cursor, prev_cursor
+
+
+def decode_history_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        timestamp, res_id = cursor.split('~')
+        return (datetime.fromisoformat(timestamp), int(res_id))
+    except ValueError:
+        return None
+
+
+def decode_uid_cursor(cursor):
+    try:
+        return int(cursor) if cursor else None
+    except ValueError:
+        return None
+
+
+def reservation_history(uid, per_page=HISTORY_PAGE_SIZE, after=None, before=None):
+    # One page of the user's reservation history with its spot and lot in a single joined query
+    return keyset_page(
+        db.select(
+            Reservation.id,
+            Reservation.vehicle_number,
+            Reservation.parking_timestamp,
+            Reservation.leaving_timestamp,
+            Reservation.parking_cost,
+            Reservation.status,
+            ParkingSpot.spot_number,
+            ParkingLot.pl_id,
+            ParkingLot.address
+        )
+        .join(ParkingSpot, Reservation.spot_id == ParkingSpot.ps_id)
+        .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.pl_id)
+        .where(Reservation.user_id == uid),
+        keys=[Reservation.parking_timestamp, Reservation.id],
+        per_page=per_page,
+        after=after,
+        before=before,
+        descending=True
+    )
+
+
+def upcoming_holds(uid):
+    # The user's upcoming holds, soonest first
+    return db.session.execute(db.select(
+        SpotHold.id,
+        SpotHold.vehicle_number,
+        SpotHold.start_time,
+        SpotHold.end_time,
+        ParkingSpot.spot_number,
+        ParkingLot.lot_name
+    ).join(ParkingSpot, SpotHold.spot_id == ParkingSpot.ps_id)
+     .join(ParkingLot, ParkingSpot.lot_id == ParkingLot.pl_id)
+     .where(SpotHold.user_id == uid, SpotHold.status == 'Held', SpotHold.end_time > datetime.now())
+     .order_by(SpotHold.start_time)).all()
+
+
+def user_by_username(username):
+    return User.query.filter_by(username=username).first()
+
+
+def latest_reservation_for_spot(spot_id):
+    return Reservation.query.filter_by(spot_id=spot_id).order_by(Reservation.parking_timestamp.desc()).first()
+
+
+def lot_spot_count(lot_id):
+    return ParkingSpot.query.filter_by(lot_id=lot_id).count()
+
+
+@bp.cli.command('backfill-rollups')
+def backfill_rollups_command():
+    """Rebuild the hourly/daily lot rollups and occupancy matrices from reservation history."""
+    backfill_rollups()
+    print("✅ Lot rollups rebuilt.")
+
+
+@bp.cli.command('sweep-reservations')
+@click.option('--lot-id', type=int, default=None, help='Only release reservations in this lot.')
+def sweep_reservations_command(lot_id):
+    """Release and bill every active reservation (end-of-day close)."""
+    released, billed = sweep_reservations(lot_id)
+    print(f"✅ Released {released} reservations, billed ₹{billed:.2f}.")
+
+
+@bp.cli.command('rebuild-user-stats')
+def rebuild_user_stats_command():
+    """Recompute the per-user summary statistics from all reservations."""
+    rebuild_user_stats()
+    print("✅ User statistics rebuilt.")
+
+
+@bp.cli.command('reconcile-counts')
+def reconcile_counts_command():
+    """Rebuild ParkingLot availability counters from ParkingSpot."""
+    reconcile_lot_counts()
+    print("✅ Parking lot counters reconciled.")
+
+
+def hot_path_calls():
+    # The lookups the routes run on every request, as calls to the same helpers the routes
+    # use, with ids taken from the database. Listing pages that intentionally read whole
+    # tables (summaries, dashboards) are not included.
+    uid, username = db.session.execute(
+        db.select(User.uid, User.username).order_by(User.uid).limit(1)).first() or (1, 'admin@parkease.com')
+    lot_id, pin_code = db.session.execute(
+        db.select(ParkingLot.pl_id, ParkingLot.pin_code).order_by(ParkingLot.pl_id).limit(1)).first() or (1, '751001')
+    spot_id = db.session.execute(
+        db.select(ParkingSpot.ps_id).where(ParkingSpot.lot_id == lot_id).limit(1)).scalar() or 1
+    user = SimpleNamespace(uid=uid, max_active_reservations=None)
+    now = datetime.now()
+
+    def acting_user_lookup():
+        invalidate_user(uid)
+        user_identity(uid)
+
+    return {
+        'login user by username': lambda: user_by_username(username),
+        'acting user by uid': acting_user_lookup,
+        'bookings in use': lambda: bookings_in_use(user),
+        'duplicate vehicle check': lambda: vehicle_is_active('MH12AB1234'),
+        'vehicle hold overlap check': lambda: vehicle_is_held('MH12AB1234', now, now + timedelta(hours=1)),
+        'latest reservation for spot': lambda: latest_reservation_for_spot(spot_id),
+        'first free spot in lot': lambda: claim_spot(lot_id=lot_id),
+        'hold overlap check': lambda: claim_spot(spot_id=spot_id),
+        'spot count in lot': lambda: lot_spot_count(lot_id),
+        'pincode search': lambda: lots_with_first_free_spot(pin_code),
+        'reservation history page': lambda: reservation_history(uid, after=(now, 1)),
+        'upcoming holds for user': lambda: upcoming_holds(uid),
+    }
+
+
+def captured_statements(call):
+    # The statements, with their parameters, that call() sends to the database
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    return statements
+
+
+@bp.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any hot-path query falls back to a full table scan."""
+    full_scans = []
+
+    # The claims write, so everything runs in one transaction that is rolled back at the end
+    try:
+        for name, call in hot_path_calls().items():
+            for statement, parameters in captured_statements(call):
+                plan = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+                details = [row[-1] for row in plan]
+                # "SCAN table" without "USING ... INDEX" means every row of the table is read;
+                # "SCAN CONSTANT ROW" is a SELECT without a FROM and reads no table
+                scans = [d for d in details if d.startswith('SCAN ') and 'USING' not in d and d != 'SCAN CONSTANT ROW']
+                print(f"{'❌' if scans else '✅'} {name}: {' | '.join(details)}")
+                if scans:
+                    full_scans.append(name)
+    finally:
+        db.session.rollback()
+
+    if full_scans:
+        raise SystemExit(f"Full table scans in: {', '.join(dict.fromkeys(full_scans))}")
+
+
+def read_slow_queries():
+    # Entries from the slow-query log and its rotated backups, oldest file first
+    path = slow_query_log_path(current_app)
+    paths = [f'{path}.{n}' for n in range(current_app.config['SLOW_QUERY_LOG_BACKUPS'], 0, -1)] + [path]
+    for log_path in paths:
+        if not os.path.exists(log_path):
+            continue
+        with open(log_path, encoding='utf-8') as log_file:
+            for line in log_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash or rotation
+
+
+@bp.cli.command('slow-query-report')
+@click.option('--top', default=10, show_default=True, help='Number of statement groups to show.')
+def slow_query_report_command(top):
+    """Summarize the slow-query log by statement fingerprint."""
+    groups = {}
+    for entry in read_slow_queries():
+        group = groups.setdefault(entry['fingerprint'], {
+            'count': 0, 'seconds': 0.0, 'max': 0.0, 'endpoints': {}, 'requests': {}, 'latest': entry
+        })
+        group['count'] += 1
+        group['seconds'] += entry['seconds']
+        group['max'] = max(group['max'], entry['seconds'])
+        endpoint = entry['endpoint'] or '(cli)'
+        group['endpoints'][endpoint] = group['endpoints'].get(endpoint, 0) + 1
+        if entry['request']:
+            group['requests'][entry['request']] = group['requests'].get(entry['request'], 0) + 1
+        group['latest'] = entry
+
+    if not groups:
+        print("ℹ️ No slow queries logged.")
+        return
+
+    ranked = sorted(groups.items(), key=lambda item: item[1]['seconds'], reverse=True)
+    for fingerprint, group in ranked[:top]:
+        latest = group['latest']
+        per_request = max(group['requests'].values(), default=1)
+        endpoints = ', '.join(f'{name} ×{count}' for name, count in
+                              sorted(group['endpoints'].items(), key=lambda item: -item[1]))
+        print(f"{fingerprint}  {group['count']} slow, {group['seconds']:.3f}s total, "
+              f"{group['seconds'] / group['count'] * 1000:.1f}ms mean, {group['max'] * 1000:.1f}ms max, "
+              f"up to {per_request} per request")
+        print(f"  endpoints: {endpoints}")
+        print(f"  statement: {statement_fingerprint(latest['statement'])[1]}")
+        for step in latest['plan'] or ['(no plan)']:
+            print(f"  plan: {step}")
+        print()
+    print(f"✅ {sum(group['count'] for group in groups.values())} slow queries in {len(groups)} groups.")
 
 
 # ------------------ COMMON ROUTES ------------------
 
-@app.route('/') 
+@bp.route('/') 
 def default():
     return render_template('default.html')
 
-@app.route('/login', methods = ['GET', 'POST'])
+@bp.route('/login', methods = ['GET', 'POST'])
 def login():
     if request.method == 'GET':
         username = request.form.get('username')
-        user = User.query.filter_by(username=username).first()
+        user = user_by_username(username)
         return render_template('userlogin.html', user=user)
     if request.method == 'POST':
         username = request.form.get('username')
         password = request.form.get('password')
     
-        user_exists = User.query.filter_by(username=username).first()
+        user_exists = user_by_username(username)
         if not user_exists:
             flash("User does not exist. Please register.")
             return redirect('/register')
         else:
             if user_exists and user_exists.password == password:
+                session.clear()
+                session['uid'] = user_exists.uid
                 if user_exists.is_superUser:
                     return redirect(f'/superUserdashboard/{user_exists.uid}')  #passing the string id here
                 else:
@@ -108,11 +2056,13 @@ def login():
                 flash("Invalid username or password. Please try again.")
                 return redirect('/login')
 
-@app.route('/editprofile/<uid>', methods=['GET', 'POST'])
+@bp.route('/editprofile/<uid>', methods=['GET', 'POST'])
+@login_required
 def editprofile(uid):
+    uid = acting_user().uid
 
     if request.method == 'GET':
-        user = User.query.filter_by(uid=uid).first()
+        user = db.session.get(User, uid)  # the form shows the current password
         return render_template('edit_profile.html', user=user)
 
     if request.method == 'POST':
@@ -123,7 +2073,7 @@ def editprofile(uid):
         new_address = request.form.get('address')
         new_pincode = request.form.get('pincode')
 
-        user_update = User.query.filter_by(uid=uid).first()
+        user_update = db.session.get(User, uid)
 
         user_update.password = new_password
         user_update.name = new_name
@@ -143,11 +2093,13 @@ def editprofile(uid):
                 flash("Address already in use.")
                 return redirect(f'/editprofile/{uid}')
 
+        bump_data_version(user_scope(uid))  # user summary charts carry the user's name
         db.session.commit()
+        invalidate_user(uid)
         flash("Profile updated successfully.")
         return redirect(f'/editprofile/{uid}')
 
-@app.route('/forgotpassword', methods=['GET', 'POST'])
+@bp.route('/forgotpassword', methods=['GET', 'POST'])
 def forgotpassword():
     if request.method == 'GET':
         return render_template('forgot_password.html')
@@ -157,7 +2109,7 @@ def forgotpassword():
         phone = request.form.get('phone')
         password = request.form.get('password')
 
-        user = User.query.filter_by(username=username).first()
+        user = user_by_username(username)
 
         if not user:
             flash("User not found.")
@@ -170,20 +2122,24 @@ def forgotpassword():
         # Update the password
         user.password = password
         db.session.commit()
+        invalidate_user(user.uid)
 
         flash("Password reset successful. Please log in.")
         return redirect('/login')
 
 
-@app.route('/logout', methods=['GET'])
+@bp.route('/logout', methods=['POST'])
 def logout():
+    # POST only, so a link or image on another site can't log anyone out;
+    # the SameSite=Lax session cookie isn't sent with cross-site POSTs either
+    session.clear()
     flash("You have been logged out successfully.")
     return redirect('/login')
 
 
 # ------------------ USER ROUTES ------------------
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'GET':
         return render_template('register.html')
@@ -201,7 +2157,7 @@ def register():
             flash("Phone number already registered. Please use a different phone number.")
             return redirect('/register')
 
-        existing_user = User.query.filter_by(username=username).first()
+        existing_user = user_by_username(username)
         if existing_user:
             flash("User already exists. Please log in.")
             return redirect('/register')
@@ -218,72 +2174,67 @@ def register():
 
         db.session.add(new_user)
         db.session.commit()
+        invalidate_user(new_user.uid)  # drops a cached "no such account" for the new uid
 
         flash("Registration successful. Please log in.")
         return redirect('/login')
     
 
-@app.route('/userdashboard/<uid>', methods=['GET', 'POST'])
+@bp.route('/userdashboard/<uid>', methods=['GET', 'POST'])
+@login_required
 def userdashboard(uid):
-    user = User.query.filter_by(uid=int(uid)).first()
+    user = acting_user()
 
-    if not user:
-        flash("❌ User not found.")
-        return redirect('/')  
-    
     if user.is_superUser:
         flash("⚠️ Access Denied: Superusers cannot access the User Dashboard.")
-        return redirect(f"/superUserdashboard/{uid}")
+        return redirect(f"/superUserdashboard/{user.uid}")
     
-    all_pincodes = ParkingLot.query.with_entities(ParkingLot.pin_code).distinct().all()
-    price_per_hour = ParkingLot.query.with_entities(ParkingLot.price_per_hour).all()
-
     results = []
+    nearby = []
     selected_pincode = None
 
-    # Count user's active reservations
-    active_reservations_count = Reservation.query.filter_by(user_id=user.uid, status='Active').count()
-    max_active_reservations = 4
+    # Count user's active reservations and holds
+    bookings_count = bookings_in_use(user)
+    max_active_reservations = reservation_limit(user)
 
-    can_book_more = active_reservations_count < max_active_reservations
+    can_book_more = bookings_count < max_active_reservations
     if not can_book_more:
-        flash("⚠️ You can only book up to 4 parking spots at a time.")
+        flash(f"⚠️ You can only book up to {max_active_reservations} parking spots at a time.")
 
     if request.method == 'POST':
-        selected_pincode = request.form.get('pincode')
+        selected_pincode = resolve_pincode(request.form.get('pincode', ''))
 
         if selected_pincode:
-            parking_lots = ParkingLot.query.filter_by(pin_code=selected_pincode).all()
-
-            for lot in parking_lots:
-                available_spots = ParkingSpot.query.filter_by(lot_id=lot.pl_id, status='A').all()
+            for lot in lots_with_first_free_spot(selected_pincode):
                 results.append({
                     'pl_id': lot.pl_id,
                     'lot_name': lot.lot_name,
                     'price_per_hour':lot.price_per_hour,
-                    'available_spot_id': available_spots[0].ps_id if available_spots else None,
-                    'available_spot_number': available_spots[0].spot_number if available_spots else None,
+                    'available_spot_id': lot.first_spot_id,
+                    'available_spot_number': lot.first_spot_number,
                     'lot_address': lot.address,
-                    'available_spots': len(available_spots)
+                    'available_spots': lot.available_count
                 })
 
+            # Fall back on the closest lots elsewhere, for when this pincode is full
+            centre = lot_directory().centres.get(selected_pincode)
+            if centre:
+                nearby = nearest_free_lots(*centre, exclude={lot['pl_id'] for lot in results})
 
-    # Fetch user's reservation history
-    reservations = Reservation.query.filter_by(user_id=user.uid).order_by(Reservation.parking_timestamp.desc()).all()
+
+    reservations, next_cursor, prev_cursor = reservation_history(
+        user.uid,
+        per_page=page_size(HISTORY_PAGE_SIZE),
+        after=decode_history_cursor(request.args.get('after')),
+        before=decode_history_cursor(request.args.get('before'))
+    )
 
     history = []
     for res in reservations:
-        if not res.spot:
-            continue
-
-        lot = ParkingLot.query.filter_by(pl_id=res.spot.lot_id).first()
-        if not lot:
-            continue
-        
         history.append({
-            'lot_id': lot.pl_id,
-            'lot_address': lot.address,
-            'spot_number': res.spot.spot_number,
+            'lot_id': res.pl_id,
+            'lot_address': res.address,
+            'spot_number': res.spot_number,
             'vehicle_number': res.vehicle_number,
             'parking_timestamp': res.parking_timestamp.strftime('%Y-%m-%d %H:%M'),
             'leaving_timestamp': res.leaving_timestamp.strftime('%Y-%m-%d %H:%M') if res.leaving_timestamp else 'NA',
@@ -292,15 +2243,19 @@ def userdashboard(uid):
             'reservation_id': res.id  # Added reservation ID for reference
         })
 
+    holds = upcoming_holds(user.uid)
+
     return render_template(
         'userdashboard.html',
         user=user,
-        all_pincodes=all_pincodes,
-        price_per_hour=price_per_hour,
         results=results,
+        nearby=nearby,
         selected_pincode=selected_pincode,
         history=history,
-        active_reservations_count=active_reservations_count,
+        holds=holds,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        bookings_count=bookings_count,
         max_active_reservations=max_active_reservations,
         can_book_more=can_book_more
     )
@@ -308,43 +2263,32 @@ def userdashboard(uid):
 
 
 
-@app.route('/bookparkingspot/<user_id>/<spot_id>', methods=['GET', 'POST'])
+@bp.route('/bookparkingspot/<user_id>/<spot_id>', methods=['GET', 'POST'])
+@login_required
+@retry_on_lock
 def bookparkingspot(user_id, spot_id):
-    user = User.query.filter_by(uid=int(user_id)).first()
+    user = acting_user()
     spot = ParkingSpot.query.filter_by(ps_id=int(spot_id)).first()
 
     if request.method == 'GET':
         return render_template('book_parking_spot.html', user=user, spot=spot)
 
     if request.method == 'POST':
-        vehicle_number = request.form.get('vehicle_number')
+        vehicle_number = normalize_vehicle_number(request.form.get('vehicle_number'))
+        if not vehicle_number:
+            flash("Please enter a valid vehicle number.")
+            return redirect(f'/userdashboard/{user.uid}')
 
-        # Check if user has less than 4 active reservations
-        active_count = Reservation.query.filter_by(user_id=user.uid, status='Active').count()
-        if active_count >= 4:
+        # Check if user is below their reservation limit
+        if bookings_in_use(user) >= reservation_limit(user):
             return redirect(f'/userdashboard/{user.uid}')
 
         # Check if vehicle number is already reserved
-        existing_reservation = Reservation.query.filter_by(vehicle_number=vehicle_number, status='Active').first()
-        if existing_reservation:
+        if vehicle_is_active(vehicle_number):
             flash(f"Vehicle number {vehicle_number} already has an active reservation.")
             return redirect(f'/userdashboard/{user.uid}')
 
-        if spot and spot.status == 'A':
-            spot.status = 'O'
-            db.session.commit()
-
-            # Create reservation
-            new_reservation = Reservation(
-                parking_timestamp=datetime.now(),
-                spot_id=spot.ps_id,
-                user_id=user.uid,
-                status="Active",
-                vehicle_number=vehicle_number
-            )
-            db.session.add(new_reservation)
-            db.session.commit()
-
+        if spot and book_spot(user, vehicle_number, spot_id=spot.ps_id):
             flash("Parking spot booked successfully.")
         else:
             flash("Parking spot is not available.")
@@ -352,29 +2296,56 @@ def bookparkingspot(user_id, spot_id):
         return redirect(f'/userdashboard/{user.uid}')
 
 
-@app.route('/reservationdetails/<reservation_id>', methods=['GET', 'POST'])
+@bp.route('/booklot/<user_id>/<lot_id>', methods=['POST'])
+@login_required
+@retry_on_lock
+def booklot(user_id, lot_id):
+    # Book whichever spot is free in the lot at the moment of booking
+    user = acting_user()
+    vehicle_number = normalize_vehicle_number(request.form.get('vehicle_number'))
+    if not vehicle_number:
+        flash("Please enter a valid vehicle number.")
+        return redirect(f'/userdashboard/{user.uid}')
+
+    if bookings_in_use(user) >= reservation_limit(user):
+        return redirect(f'/userdashboard/{user.uid}')
+
+    if vehicle_is_active(vehicle_number):
+        flash(f"Vehicle number {vehicle_number} already has an active reservation.")
+        return redirect(f'/userdashboard/{user.uid}')
+
+    reservation = book_spot(user, vehicle_number, lot_id=int(lot_id))
+    if reservation:
+        flash(f"Parking spot {reservation.spot.spot_number} booked successfully.")
+    else:
+        flash("No parking spots are available in this lot.")
+
+    return redirect(f'/userdashboard/{user.uid}')
+
+
+@bp.route('/reservationdetails/<reservation_id>', methods=['GET', 'POST'])
+@login_required
+@retry_on_lock
 def reservationdetails(reservation_id):
+    user = acting_user()
     reservation = Reservation.query.filter_by(id=int(reservation_id)).first()
-    user = User.query.filter_by(uid=reservation.user_id).first()
+    if not reservation or reservation.user_id != user.uid:
+        flash("Reservation not found.")
+        return redirect(f"/userdashboard/{user.uid}")
     lot = ParkingLot.query.filter_by(pl_id=reservation.spot.lot_id).first()
 
-    # Calculate estimated cost
-    if reservation.leaving_timestamp:
-        duration = (reservation.leaving_timestamp - reservation.parking_timestamp).total_seconds() / 3600  # in hours
-    else:
-        duration = (datetime.now() - reservation.parking_timestamp).total_seconds() / 3600  # in hours
-    
-    rounded_duration = math.ceil(duration)
-    estimated_cost = rounded_duration * lot.price_per_hour
+    # Calculate estimated cost from the lot's tariff
+    leaving = reservation.leaving_timestamp or datetime.now()
+    rounded_duration = pricing.billed_hours(reservation.parking_timestamp, leaving)
+    estimated_cost = parking_cost(lot.pl_id, reservation.parking_timestamp, leaving)
 
     if request.method == 'POST':
 
         # Handle releasing the parking spot
-        spot = ParkingSpot.query.filter_by(ps_id=reservation.spot_id).first()
-        spot.status = 'A'  
-        reservation.status = 'Released'  
-        reservation.leaving_timestamp = datetime.now() 
-        reservation.parking_cost = estimated_cost 
+        if reservation.status != 'Active' or not release_reservation(reservation, estimated_cost):
+            db.session.rollback()
+            flash("This reservation has already been released.")
+            return redirect(f"/userdashboard/{user.uid}")
 
         db.session.commit()
         flash("Parking spot released successfully.")
@@ -384,146 +2355,330 @@ def reservationdetails(reservation_id):
 
 
 
-@app.route('/releaseparkingspot/<reservation_id>', methods=['POST'])
+@bp.route('/releaseparkingspot/<reservation_id>', methods=['POST'])
+@login_required
+@retry_on_lock
 def releaseparkingspot(reservation_id):
+    user = acting_user()
     reservation = Reservation.query.filter_by(id=int(reservation_id)).first()
-    spot = ParkingSpot.query.filter_by(ps_id=reservation.spot_id).first()
+    if not reservation or reservation.user_id != user.uid:
+        flash("Reservation not found.")
+        return redirect(f"/userdashboard/{user.uid}")
 
-    spot.status = 'A'  
-    reservation.status = 'Released'  
-    reservation.leaving_timestamp = datetime.now()  
+    if reservation.status != 'Active' or not release_reservation(reservation):
+        db.session.rollback()
+        flash("This reservation has already been released.")
+        return redirect(f"/userdashboard/{user.uid}")
 
     db.session.commit()
 
     flash("Parking spot released successfully.")
-    return redirect(f"/userdashboard/{reservation.user_id}")
+    return redirect(f"/userdashboard/{user.uid}")
 
-@app.route('/userSummary/<uid>', methods=['GET', 'POST'])
+@bp.route('/userSummary/<uid>', methods=['GET', 'POST'])
+@login_required
 def userSummary(uid):
-    user = User.query.filter_by(uid=int(uid)).first()
-    reservations = Reservation.query.filter_by(user_id=user.uid).all()
+    user = acting_user()
 
     if user.is_superUser:
         flash("⚠️ Access Denied: Only Users can access this page.")
-        return redirect(f"/superUserdashboard/{uid}")
-    
-    # ------ chart 1: Reservation History Over Time ------
-    reservation_times = [r.parking_timestamp.strftime('%Y-%m-%d') for r in reservations if r.user_id == user.uid]
-    unique_dates = list(set(reservation_times))  # Unique dates of reservations
-    reservations_per_day = [reservation_times.count(date) for date in unique_dates]
+        return redirect(f"/superUserdashboard/{user.uid}")
+
+    if not wants_png_charts():
+        return render_template('user_summary.html', user=user, data_url=url_for('parkease.userSummarydata', uid=user.uid))
+
+    scope = user_scope(user.uid)
+    version = data_version(scope)
+    chart_series = {}
+
+    def chart_data():
+        # Only hit the database when at least one chart has to be redrawn
+        if not chart_series:
+            chart_series.update(user_chart_data(user))
+        return chart_series
+
+    plot_path_1 = cached_chart('reservation_history', scope, version, lambda: draw_line_chart(
+        chart_data()['reservations_per_day'], 'Date', 'Number of Reservations', 'Reservation History Over Time', 'blue'))
+    plot_path_2 = cached_chart('user_revenue_per_lot', scope, version, lambda: draw_bar_chart(
+        chart_data()['revenue_per_lot'], 'Parking Lot', 'Total Amount Spent (₹)',
+        f'Total Amount Spent by {user.name} in Each Parking Lot', 'green'))
+    plot_path_3 = cached_chart('active_reservations_pie_chart', scope, version, lambda: draw_pie_chart(
+        chart_data()['active_split'], f"Active Reservations Count for {user.name}", ['skyblue', 'lightcoral']))
+    plot_path_4 = cached_chart('average_parking_duration', scope, version, lambda: draw_histogram(
+        chart_data()['duration_histogram'], 'Duration (minutes)', 'Number of Parking Sessions', 'Average Parking Duration', 'purple'))
+
+    return render_template('user_summary.html', user=user, plot_path_1=plot_path_1, plot_path_2=plot_path_2, plot_path_3=plot_path_3, plot_path_4=plot_path_4)
+
+
+@bp.route('/fleetbook/<user_id>/<lot_id>', methods=['POST'])
+@login_required
+@retry_on_lock
+def fleetbook(user_id, lot_id):
+    # Book several vehicles into one lot at once. Takes JSON {"vehicle_numbers": [...]}
+    # and answers with per-vehicle results, or a form field with one vehicle per line.
+    user = acting_user()
+    if user.is_superUser:
+        if request.is_json:
+            return jsonify({'error': 'Only users can book parking spots.'}), 403
+        flash("⚠️ Access Denied: Only Users can access this page.")
+        return redirect(f"/superUserdashboard/{user.uid}")
 
-    fig1, ax1 = plt.subplots()
-    ax1.plot(unique_dates, reservations_per_day, marker='o', color='blue')
-    ax1.set_xlabel('Date')
-    ax1.set_ylabel('Number of Reservations')
-    ax1.set_title('Reservation History Over Time')
+    if request.is_json:
+        vehicle_numbers = (request.get_json(silent=True) or {}).get('vehicle_numbers')
+        if not isinstance(vehicle_numbers, list) or not all(isinstance(v, str) for v in vehicle_numbers):
+            return jsonify({'error': 'vehicle_numbers must be a list of strings.'}), 400
+    else:
+        vehicle_numbers = request.form.get('vehicle_numbers', '').replace(',', '\n').splitlines()
+    vehicle_numbers = [number.strip() for number in vehicle_numbers]
+    if not request.is_json:
+        vehicle_numbers = [number for number in vehicle_numbers if number]
+
+    if len(vehicle_numbers) > current_app.config['MAX_FLEET_BOOKING']:
+        message = f"At most {current_app.config['MAX_FLEET_BOOKING']} vehicles can be booked at once."
+        if request.is_json:
+            return jsonify({'error': message}), 400
+        flash(message)
+        return redirect(f'/userdashboard/{user.uid}')
 
-    plot_path_1 = "static/reservation_history.png"
-    fig1.tight_layout()
-    fig1.savefig(plot_path_1)
-    plt.close(fig1)
+    results = book_fleet(user, vehicle_numbers, int(lot_id))
 
-# --- Chart2: Revenue Spent by User in Each Parking Lot --- 
+    if request.is_json:
+        return jsonify({'lot_id': int(lot_id), 'results': results})
 
-    user_lot_revenue = {}
+    booked = [r for r in results if r['status'] == 'booked']
+    flash(f"Booked {len(booked)} of {len(results)} vehicles.")
+    for r in results:
+        if r['status'] != 'booked':
+            flash(f"{r['vehicle_number']}: {r['status'].replace('_', ' ')}")
+    return redirect(f'/userdashboard/{user.uid}')
 
-    for res in reservations:
-        if res.user_id == user.uid and res.spot and res.spot.parking_lot and res.parking_cost:
-            lot_name = res.spot.parking_lot.lot_name
-            if lot_name in user_lot_revenue:
-                user_lot_revenue[lot_name] += res.parking_cost  # Add to existing revenue
-            else:
-                user_lot_revenue[lot_name] = res.parking_cost  # Create a new entry
 
-    lot_names_user = list(user_lot_revenue.keys())
-    user_revenues = list(user_lot_revenue.values())
+@bp.route('/holdlot/<user_id>/<lot_id>', methods=['POST'])
+@login_required
+@retry_on_lock
+def holdlot(user_id, lot_id):
+    # Reserve a spot in the lot for a future window
+    user = acting_user()
+    vehicle_number = normalize_vehicle_number(request.form.get('vehicle_number'))
+    if not vehicle_number:
+        flash("Please enter a valid vehicle number.")
+        return redirect(f'/userdashboard/{user.uid}')
+
+    try:
+        start, end = parse_hold_window(request.form.get('start_time'), request.form.get('end_time'))
+    except ValueError as e:
+        flash(f"❌ {e}")
+        return redirect(f'/userdashboard/{user.uid}')
+
+    if bookings_in_use(user) >= reservation_limit(user):
+        return redirect(f'/userdashboard/{user.uid}')
+
+    if vehicle_is_held(vehicle_number, start, end):
+        flash(f"Vehicle number {vehicle_number} already has a hold overlapping that window.")
+        return redirect(f'/userdashboard/{user.uid}')
 
-    fig2, ax2 = plt.subplots()
-    ax2.bar(lot_names_user, user_revenues, color='green', edgecolor='black', width=0.4)
-    ax2.set_xlabel('Parking Lot')
-    ax2.set_ylabel('Total Amount Spent (₹)')
-    ax2.set_title(f'Total Amount Spent by {user.name} in Each Parking Lot')
+    held = hold_spot(user, vehicle_number, int(lot_id), start, end)
+    if held:
+        flash(f"Spot {held[1]} held from {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M}.")
+    else:
+        flash("No spot in this lot is free for that window.")
 
-    plot_path_2 = "static/user_revenue_per_lot.png"
-    fig2.tight_layout()
-    fig2.savefig(plot_path_2)
-    plt.close(fig2)
+    return redirect(f'/userdashboard/{user.uid}')
 
-#-------- chart 3: Active Reservations Count pie chart --------
 
-    active_reservations = len([r for r in reservations if r.status == 'Active'])
+@bp.route('/checkinhold/<user_id>/<hold_id>', methods=['POST'])
+@login_required
+@retry_on_lock
+def checkinhold(user_id, hold_id):
+    # Turn a hold into an active reservation on its spot
+    user = acting_user()
+    hold = SpotHold.query.filter_by(id=int(hold_id), user_id=user.uid, status='Held').first()
 
-    fig3, ax3 = plt.subplots()
+    if not hold:
+        flash("Hold not found.")
+        return redirect(f'/userdashboard/{user.uid}')
 
-    explode = (0.1, 0)  # "explode" the first slice (Active reservations)
-    ax3.pie([active_reservations, len(reservations) - active_reservations],
-        labels=['Active', 'Released'], autopct='%1.1f%%', startangle=90,
-        explode=explode, colors=['skyblue', 'lightcoral'])
-    ax3.set_title(f"Active Reservations Count for {user.name}")
+    now = datetime.now()
+    if now < hold.start_time - HOLD_CHECKIN_EARLY or now >= hold.end_time:
+        flash(f"You can check in from {hold.start_time - HOLD_CHECKIN_EARLY:%Y-%m-%d %H:%M} until {hold.end_time:%Y-%m-%d %H:%M}.")
+        return redirect(f'/userdashboard/{user.uid}')
 
-    plot_path_3 = "static/active_reservations_pie_chart.png"
-    fig3.tight_layout()
-    fig3.savefig(plot_path_3)
-    plt.close(fig3)
+    # The hold itself is already counted
+    if bookings_in_use(user) > reservation_limit(user):
+        return redirect(f'/userdashboard/{user.uid}')
 
-    #--------- Histogram of Parking Durations ---------
-    durations = [(res.leaving_timestamp - res.parking_timestamp).total_seconds() / 60 for res in reservations if res.user_id == user.uid and res.leaving_timestamp]
+    if vehicle_is_active(hold.vehicle_number):
+        flash(f"Vehicle number {hold.vehicle_number} already has an active reservation.")
+        return redirect(f'/userdashboard/{user.uid}')
 
-    bins=[0, 30, 60, 90, 120, 150, 180, 210, 240, 270, 300]
-    fig4, ax4 = plt.subplots()
-    ax4.hist(durations, bins=bins, color='purple', edgecolor='black') 
-    ax4.set_xlabel('Duration (minutes)')
-    ax4.set_ylabel('Number of Parking Sessions') 
-    ax4.set_title('Average Parking Duration')
+    # Released in the same transaction as the booking, so its own window doesn't block the claim
+    hold.status = 'CheckedIn'
+    bump_data_version(hold_scope(hold.spot.lot_id))
+    db.session.flush()
 
-    plot_path_4 = "static/average_parking_duration.png"
-    fig4.tight_layout()
-    fig4.savefig(plot_path_4)
-    plt.close(fig4)
+    reservation = book_spot(user, hold.vehicle_number, spot_id=hold.spot_id, until=hold.end_time)
+    if reservation:
+        flash(f"Checked in to spot {reservation.spot.spot_number}.")
+    else:
+        flash("Your spot is still occupied. Please contact the parking staff.")
+
+    return redirect(f'/userdashboard/{user.uid}')
+
+
+@bp.route('/cancelhold/<user_id>/<hold_id>', methods=['POST'])
+@login_required
+@retry_on_lock
+def cancelhold(user_id, hold_id):
+    user = acting_user()
+    hold = SpotHold.query.filter_by(id=int(hold_id), user_id=user.uid, status='Held').first()
+
+    if hold:
+        hold.status = 'Cancelled'
+        bump_data_version(hold_scope(hold.spot.lot_id))
+        db.session.commit()
+        flash("Hold cancelled.")
+    else:
+        flash("Hold not found.")
+
+    return redirect(f'/userdashboard/{user.uid}')
+
+
+@bp.route('/lotavailability/<lot_id>', methods=['GET'])
+def lotavailability(lot_id):
+    # Spot numbers in the lot that are free to hold between ?start= and ?end=
+    if not acting_user():
+        return jsonify({'error': 'Please log in.'}), 401
+
+    try:
+        start, end = parse_hold_window(request.args.get('start'), request.args.get('end'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    free = free_spots_between(int(lot_id), start, end)
+    return jsonify({'lot_id': int(lot_id), 'free_spots': [spot.spot_number for spot in free]})
+
+
+@bp.route('/lotsearch/<uid>', methods=['GET'])
+def lotsearch(uid):
+    # Autocomplete for the pincode search boxes on both dashboards
+    user = acting_user()
+    if not user:
+        return jsonify({'error': 'Please log in.'}), 401
 
+    limit = max(1, min(request.args.get('limit', LOT_SEARCH_LIMIT, type=int), MAX_PAGE_SIZE))
+    return jsonify({'results': search_lots(request.args.get('q', ''), limit)})
 
-    return render_template('user_summary.html', user=user, reservations=reservations,plot_path_1=plot_path_1, plot_path_2=plot_path_2, plot_path_3=plot_path_3, plot_path_4=plot_path_4)
+
+@bp.route('/nearestlots/<uid>', methods=['GET'])
+def nearestlots(uid):
+    # Nearest lots with free spots to ?lat=&lng=, or to the centre of ?pincode=
+    user = acting_user()
+    if not user:
+        return jsonify({'error': 'Please log in.'}), 401
+
+    try:
+        origin = parse_coordinates(request.args.get('lat'), request.args.get('lng'))
+    except ValueError:
+        return jsonify({'error': 'lat and lng must be valid coordinates.'}), 400
+    if origin[0] is None:
+        origin = lot_directory().centres.get(request.args.get('pincode', user.pincode))
+    if not origin:
+        return jsonify({'error': 'No location to search from.'}), 400
+
+    limit = max(1, min(request.args.get('limit', NEAREST_LOTS_LIMIT, type=int), MAX_PAGE_SIZE))
+    return jsonify({'results': nearest_free_lots(*origin, limit=limit)})
+
+
+@bp.route('/userSummary/<uid>/data', methods=['GET'])
+def userSummarydata(uid):
+    user = acting_user()
+    if not user or user.is_superUser:
+        return jsonify({'error': 'Only users have a user summary.'}), 404
+
+    return chart_data_response(user_scope(user.uid), lambda: user_chart_data(user))
 
 # ------------------ SUPERUSER ROUTES ------------------
 
 
-@app.route('/superUserdashboard/<uid>', methods=['GET', 'POST'])
+@bp.route('/superUserdashboard/<uid>', methods=['GET', 'POST'])
+@login_required
 def superUserdashboard(uid):
     if request.method == 'GET':
-        user = User.query.filter_by(uid=int(uid)).first()
-        if not user:
-            flash("❌ User not found.")
-            return redirect('/') 
-
+        user = acting_user()
         if not user.is_superUser:
             flash("⚠️ Access Denied: Only superusers can access this page.")
-            return redirect(f"/userdashboard/{uid}") 
+            return redirect(f"/userdashboard/{user.uid}") 
 
         lots = ParkingLot.query.all()
         parking_spots = ParkingSpot.query.all()
 
+        # Last 7 days of revenue and occupancy per lot, from the daily rollups
+        week_start = date.today() - timedelta(days=6)
+        recent = {lot_id: (revenue, occupied_hours) for lot_id, revenue, occupied_hours in db.session.execute(
+            db.select(LotDailyRollup.lot_id, func.sum(LotDailyRollup.revenue), func.sum(LotDailyRollup.occupied_hours))
+            .where(LotDailyRollup.day >= week_start)
+            .group_by(LotDailyRollup.lot_id)
+        )}
+
         for lot in lots:
-            lot_spots = [spot for spot in parking_spots if spot.lot_id == lot.pl_id]
-            lot.occupied_spots = sum(1 for spot in lot_spots if spot.status == 'O')
-            lot.available_spots = sum(1 for spot in lot_spots if spot.status == 'A')
+            lot.occupied_spots = lot.occupied_count
+            lot.available_spots = lot.available_count
+            lot.week_revenue, lot.week_occupied_hours = recent.get(lot.pl_id, (0.0, 0.0))
 
         return render_template('superUserdashboard.html', user=user, parking_lots=lots, parking_spots=parking_spots)
     
 
-@app.route('/allusers/<uid>', methods=['GET'])
+@bp.route('/allusers/<uid>', methods=['GET'])
+@login_required
 def allusers(uid):
-    user = User.query.filter_by(uid=int(uid)).first()
-    users = User.query.all()
+    user = acting_user()
     if not user.is_superUser:
             flash("⚠️ Access Denied: Only superusers can access this page.")
-            return redirect(f"/userdashboard/{uid}") 
+            return redirect(f"/userdashboard/{user.uid}") 
+
+    users, next_cursor, prev_cursor = keyset_page(
+        db.select(User.uid, User.username, User.name, User.phone, User.address, User.pincode,
+                  User.max_active_reservations),
+        keys=[User.uid],
+        per_page=page_size(USERS_PAGE_SIZE),
+        after=decode_uid_cursor(request.args.get('after')),
+        before=decode_uid_cursor(request.args.get('before'))
+    )
     
-    return render_template('all_users.html', users=users, user=user)
+    return render_template('all_users.html', users=users, user=user, next_cursor=next_cursor, prev_cursor=prev_cursor,
+                           default_limit=current_app.config['MAX_ACTIVE_RESERVATIONS'])
+
 
+@bp.route('/setlimit/<uid>/<user_id>', methods=['POST'])
+@login_required
+def setlimit(uid, user_id):
+    # Superuser override of one account's active reservation limit; blank restores the default
+    user = acting_user()
+    if not user.is_superUser:
+        flash("⚠️ Access Denied: Only superusers can access this page.")
+        return redirect(f"/userdashboard/{user.uid}")
 
-@app.route('/addlot', methods=['GET', 'POST'])
+    account = db.session.get(User, int(user_id))
+    limit = request.form.get('max_active_reservations', '').strip()
+    if not account or (limit and (not limit.isdigit())):
+        flash("❌ Enter a whole number, or leave it blank for the default.")
+        return redirect(f'/allusers/{user.uid}')
+
+    account.max_active_reservations = int(limit) if limit else None
+    db.session.commit()
+    invalidate_user(account.uid)
+    flash(f"Booking limit for {account.username} updated.")
+    return redirect(f'/allusers/{user.uid}')
+
+
+@bp.route('/addlot', methods=['GET', 'POST'])
+@login_required
 def addlot():
-    user = User.query.filter_by(is_superUser=True).first()  
+    user = acting_user()
+    if not user.is_superUser:
+        flash("⚠️ Access Denied: Only superusers can access this page.")
+        return redirect(f"/userdashboard/{user.uid}")
+
     if request.method == 'GET':
         return render_template('add_parkinglot.html', user=user)
 
@@ -540,6 +2695,19 @@ def addlot():
             flash("Price per hour and maximum spots are required.")
             return redirect('/addlot')
 
+        try:
+            latitude, longitude = parse_coordinates(request.form.get('latitude'), request.form.get('longitude'))
+        except ValueError:
+            flash("Latitude and longitude must both be given as valid coordinates.")
+            return redirect('/addlot')
+
+        tariff = request.form.get('tariff', '').strip() or None
+        try:
+            pricing.parse_schedule(tariff)
+        except ValueError as e:
+            flash(str(e))
+            return redirect('/addlot')
+
         # Check for existing lot
         existing_lot = ParkingLot.query.filter_by(lot_name=lot_name, address=address).first()
         if existing_lot:
@@ -553,19 +2721,19 @@ def addlot():
             pin_code=pin_code,
             price_per_hour=float(price_per_hour),
             max_spots=int(max_spots),
+            tariff=tariff,
+            latitude=latitude,
+            longitude=longitude,
+            available_count=int(max_spots),
+            occupied_count=0,
             user_id=uid
         )
         db.session.add(new_lot)
-        db.session.commit()
+        db.session.flush()
 
         # Create parking spots for the new lot
-        for i in range(1, int(max_spots) + 1):
-            new_spot = ParkingSpot(
-                lot_id=new_lot.pl_id,
-                status='A',
-                spot_number=i  
-            )
-            db.session.add(new_spot)
+        provision_spots(new_lot.pl_id, 1, int(max_spots))
+        invalidate_lot_directory()
 
         db.session.commit()
 
@@ -574,11 +2742,15 @@ def addlot():
 
 
 
-@app.route('/editparkinglot/<pl_id>', methods=['GET', 'POST'])
+@bp.route('/editparkinglot/<pl_id>', methods=['GET', 'POST'])
+@login_required
 def editparkinglot(pl_id):
-    
+    user = acting_user()
+    if not user.is_superUser:
+        flash("⚠️ Access Denied: Only superusers can access this page.")
+        return redirect(f"/userdashboard/{user.uid}")
+
     if request.method == 'GET':
-        user = User.query.filter_by(is_superUser=True).first()  
         plot = ParkingLot.query.filter_by(pl_id=pl_id).first()
         return render_template('edit_parkinglot.html', plot=plot,user=user)
     
@@ -590,6 +2762,19 @@ def editparkinglot(pl_id):
         new_price_per_hour = request.form.get('price_per_hour')
         new_max_spots = request.form.get('max_spots')
 
+        try:
+            new_latitude, new_longitude = parse_coordinates(request.form.get('latitude'), request.form.get('longitude'))
+        except ValueError:
+            flash("Latitude and longitude must both be given as valid coordinates.")
+            return redirect(f'/editparkinglot/{pl_id}')
+
+        new_tariff = request.form.get('tariff', '').strip() or None
+        try:
+            pricing.parse_schedule(new_tariff)
+        except ValueError as e:
+            flash(str(e))
+            return redirect(f'/editparkinglot/{pl_id}')
+
         plot_update = ParkingLot.query.filter_by(pl_id=pl_id).first()
 
         plot_update.lot_name = new_lot_name
@@ -597,26 +2782,22 @@ def editparkinglot(pl_id):
         plot_update.pin_code = new_pin_code
         plot_update.price_per_hour = float(new_price_per_hour)
         plot_update.max_spots = int(new_max_spots)
+        plot_update.tariff = new_tariff
+        plot_update.latitude = new_latitude
+        plot_update.longitude = new_longitude
 
         # Update the number of parking spots based on the new max_spots 
-        current_spot_count = ParkingSpot.query.filter_by(lot_id=pl_id).count()
+        current_spot_count = lot_spot_count(pl_id)
         if int(new_max_spots) > current_spot_count:
             max_spot_number = db.session.query(func.max(ParkingSpot.spot_number)).filter_by(lot_id=pl_id).scalar() or 0
 
-            for i in range(1, int(new_max_spots) - current_spot_count + 1):
-                new_spot = ParkingSpot(
-                    lot_id=pl_id,
-                    status='A',
-                    spot_number=max_spot_number + i
-                )
-                db.session.add(new_spot)
+            added = provision_spots(pl_id, max_spot_number + 1, int(new_max_spots) - current_spot_count)
+            adjust_lot_counts(pl_id, available=added)
 
         elif int(new_max_spots) < current_spot_count:
             # Remove only available spots starting from the highest spot_number
-            removable_spots = ParkingSpot.query.filter_by(lot_id=pl_id, status='A').order_by(ParkingSpot.spot_number.desc()).limit(current_spot_count - int(new_max_spots)).all()
-
-            for spot in removable_spots:
-                db.session.delete(spot)
+            removed = remove_free_spots(pl_id, current_spot_count - int(new_max_spots))
+            adjust_lot_counts(pl_id, available=-removed)
 
         # Check if lot name is changing and if the new lot name is already taken
         if new_lot_name != plot_update.lot_name:
@@ -629,178 +2810,209 @@ def editparkinglot(pl_id):
             if ParkingLot.query.filter_by(address=new_address).first():
                 flash("Parking lot with this address already exists.")
                 return redirect('/editparkinglot/'+ str(pl_id))
-            
+
+        invalidate_lot_directory()
         db.session.commit()
         flash("Parking lot updated successfully.")
         return redirect('/editparkinglot/' + str(pl_id))
     
 
 
-@app.route('/deleteparkinglot/<pl_id>', methods=['GET'])
+@bp.route('/sweep/<uid>', methods=['POST'])
+@login_required
+@retry_on_lock
+def sweep(uid):
+    # Close one lot (form field lot_id) or every lot: release and bill all active reservations
+    user = acting_user()
+    if not user.is_superUser:
+        flash("⚠️ Access Denied: Only superusers can access this page.")
+        return redirect(f"/userdashboard/{user.uid}")
+
+    lot_id = request.form.get('lot_id', type=int)
+    released, billed = sweep_reservations(lot_id)
+    flash(f"Released {released} reservations and billed ₹{billed:.2f}.")
+    return redirect(f'/superUserdashboard/{user.uid}')
+
+
+@bp.route('/deleteparkinglot/<pl_id>', methods=['POST'])
+@login_required
 def deleteparkinglot(pl_id):
-    user = User.query.filter_by(is_superUser=True).first()
+    user = acting_user()
+    if not user.is_superUser:
+        flash("⚠️ Access Denied: Only superusers can access this page.")
+        return redirect(f"/userdashboard/{user.uid}")
+
     parking_lot = ParkingLot.query.filter_by(pl_id=pl_id).first()
 
     if not parking_lot:
         flash("Parking lot not found.")
         return redirect('/superUserdashboard/' + str(user.uid)) 
 
-    occupied_spots = ParkingSpot.query.filter(ParkingSpot.lot_id == pl_id, ParkingSpot.status != 'A').count()
-
-    if occupied_spots > 0:
+    if parking_lot.occupied_count > 0:
         flash("Cannot delete parking lot. All spots must be available before deletion.")
         return redirect('/superUserdashboard/' + str(user.uid))  
 
     # If all spots are available, delete the parking lot
+    SpotHold.query.filter(SpotHold.spot_id.in_(
+        db.select(ParkingSpot.ps_id).where(ParkingSpot.lot_id == pl_id)
+    )).delete(synchronize_session=False)
     ParkingSpot.query.filter_by(lot_id=pl_id).delete() 
+    LotHourlyRollup.query.filter_by(lot_id=pl_id).delete()
+    LotDailyRollup.query.filter_by(lot_id=pl_id).delete()
+    LotOccupancy.query.filter_by(lot_id=pl_id).delete()
     db.session.delete(parking_lot)
+    invalidate_lot_directory()
     db.session.commit()
 
     flash("Parking lot deleted successfully.")
     return redirect('/superUserdashboard/' + str(user.uid)) 
 
 
-@app.route('/spotdetails/<spot_id>')
+@bp.route('/spotdetails/<spot_id>')
+@login_required
 def spotdetails(spot_id):
+    users = acting_user()
+    if not users.is_superUser:
+        flash("⚠️ Access Denied: Only superusers can access this page.")
+        return redirect(f"/userdashboard/{users.uid}")
+
     spot = ParkingSpot.query.filter_by(ps_id=spot_id).first()
     if not spot:
         flash("Parking spot not found.")
         return redirect(f'/superUserdashboard/{users.uid}')
 
-    reservation = Reservation.query.filter_by(spot_id=spot_id).order_by(Reservation.parking_timestamp.desc()).first()
+    reservation = latest_reservation_for_spot(spot_id)
     if not reservation:
         flash("No reservation found for this spot.")
         return redirect(f'/superUserdashboard/{users.uid}')
 
-    user = User.query.filter_by(uid=reservation.user_id).first()
-    users = User.query.filter_by(uid=User.uid).first()
+    user = reservation.user
     lot = ParkingLot.query.filter_by(pl_id=spot.lot_id).first()
 
     # Calculate estimated cost if released
-    duration_hours = 1
     if reservation.leaving_timestamp:
-        duration = reservation.leaving_timestamp - reservation.parking_timestamp
-        duration_hours = duration.total_seconds() / 3600
+        leaving = reservation.leaving_timestamp
     elif reservation.status.lower() == "active":
-        duration = datetime.now() - reservation.parking_timestamp
-        duration_hours = duration.total_seconds() / 3600
-
+        leaving = datetime.now()
+    else:
+        leaving = reservation.parking_timestamp + timedelta(hours=1)
 
-    rounded_duration = math.ceil(duration_hours)
-    est_cost = round(rounded_duration * lot.price_per_hour, 2)
+    rounded_duration = pricing.billed_hours(reservation.parking_timestamp, leaving)
+    est_cost = round(parking_cost(lot.pl_id, reservation.parking_timestamp, leaving), 2)
 
     return render_template("spot_details.html", spot=spot, reservation=reservation, user=user, est_cost=est_cost,users=users,rounded_duration=rounded_duration)
 
-@app.route('/superUsersearch/<uid>', methods=['GET', 'POST'])
+@bp.route('/superUsersearch/<uid>', methods=['GET', 'POST'])
+@login_required
 def superUsersearch(uid):
-    user = User.query.filter_by(uid=int(uid)).first()
-    all_pincodes = ParkingLot.query.with_entities(ParkingLot.pin_code).distinct().all()
+    user = acting_user()
     results = []
     selected_pincode = None
 
     if not user.is_superUser:
             flash("⚠️ Access Denied: Only superusers can access this page.")
-            return redirect(f"/userdashboard/{uid}") 
+            return redirect(f"/userdashboard/{user.uid}") 
 
     if request.method == 'POST':
-        selected_pincode = request.form.get('pincode')
+        selected_pincode = resolve_pincode(request.form.get('pincode', ''))
 
         if selected_pincode:
-            parking_lots = ParkingLot.query.filter_by(pin_code=selected_pincode).all()
-
-            for lot in parking_lots:
-                available_spots = ParkingSpot.query.filter_by(lot_id=lot.pl_id, status='A').all()
-                occupied_spots = ParkingSpot.query.filter_by(lot_id=lot.pl_id, status='O').all()
+            for lot in lots_with_first_free_spot(selected_pincode):
                 results.append({
                     'pl_id': lot.pl_id,
                     'lot_name': lot.lot_name,
-                    'available_spot_id': available_spots[0].ps_id if available_spots else None,
+                    'available_spot_id': lot.first_spot_id,
                     'lot_address': lot.address,
-                    'available_spots': len(available_spots),
-                    'occupied_spots': len(occupied_spots)
+                    'available_spots': lot.available_count,
+                    'occupied_spots': lot.occupied_count
                 })
 
-    return render_template("superUser_search.html", user=user, all_pincodes=all_pincodes, results=results, selected_pincode=selected_pincode)
+    return render_template("superUser_search.html", user=user, results=results, selected_pincode=selected_pincode)
 
-@app.route('/superUsersummary/<uid>', methods=['GET'])
+@bp.route('/superUsersummary/<uid>', methods=['GET'])
+@login_required
 def superUsersummary(uid):
-    user = User.query.filter_by(uid=int(uid)).first()
-    parking_lots = ParkingLot.query.all()
-    parking_spots = ParkingSpot.query.all()
-    reservations = Reservation.query.all()
+    user = acting_user()
 
     if not user.is_superUser:
             flash("⚠️ Access Denied: Only superusers can access this page.")
-            return redirect(f"/userdashboard/{uid}") 
-    
-    # --- Chart 1: Parking Spot Availability ---
-    
-    available_spots = len([ps for ps in parking_spots if ps.status == 'A'])
-    occupied_spots = len([ps for ps in parking_spots if ps.status == 'O'])
-    
-    # Data for the pie chart
-    labels = ['Available', 'Occupied']
-    sizes = [available_spots, occupied_spots]
-    colors = ['skyblue', 'lightcoral']  # Colors for the pie chart
-
-    fig1, ax1 = plt.subplots()
+            return redirect(f"/userdashboard/{user.uid}") 
 
-    explode = (0.1, 0)  # "explode" the first slice (Available spots
-    ax1.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors, explode=explode, shadow=True)
-    ax1.set_title("Parking Spot Availability")
+    start, end = parse_date_range()
+    parking_lots = ParkingLot.query.all()
+    # Only the most recent reservations in the range are listed; the charts cover all of them
+    reservations = Reservation.query.options(db.joinedload(Reservation.user)).filter(
+        *in_date_range(Reservation.parking_timestamp, start, end)
+    ).order_by(Reservation.parking_timestamp.desc()).limit(RECENT_RESERVATIONS_LIMIT).all()
+    page = dict(user=user, parking_lots=parking_lots, reservations=reservations, start=start, end=end)
+
+    if not wants_png_charts():
+        # Only the parsed dates are passed on; None drops the parameter from the URL
+        data_url = url_for('parkease.superUsersummarydata', uid=user.uid,
+                           start=start.isoformat() if start else None, end=end.isoformat() if end else None)
+        return render_template("superUser_summary.html", data_url=data_url, **page)
+
+    version = data_version('global')
+    scope = f'global|{start}|{end}'
+    chart_series = {}
+
+    def chart_data():
+        if not chart_series:
+            chart_series.update(superuser_chart_data(start, end))
+        return chart_series
+
+    plot_path_1 = cached_chart('spot_availability_pie', scope, version, lambda: draw_pie_chart(
+        chart_data()['availability'], "Parking Spot Availability", ['skyblue', 'lightcoral'], shadow=True))
+    plot_path_2 = cached_chart('reservations_over_time', scope, version, lambda: draw_line_chart(
+        chart_data()['reservations_per_day'], 'Date', 'Reservations Count', 'Parking Reservations Over Time', 'green'))
+    plot_path_3 = cached_chart('revenue_per_lot', scope, version, lambda: draw_bar_chart(
+        chart_data()['revenue_per_lot'], 'Parking Lot', 'Total Revenue Collected (₹)', 'Total Revenue from Each Parking Lot', 'purple'))
+    plot_path_4 = cached_chart('occupancy_per_day', scope, version, lambda: draw_line_chart(
+        chart_data()['occupancy_per_day'], 'Date', 'Occupied Spot-Hours', 'Occupancy Trend', 'orange'))
+    plot_path_5 = cached_chart('revenue_per_day', scope, version, lambda: draw_line_chart(
+        chart_data()['revenue_per_day'], 'Date', 'Revenue (₹)', 'Revenue Trend', 'purple'))
 
-    plot_path_1 = "static/spot_availability_pie.png"
-    fig1.tight_layout()
-    fig1.savefig(plot_path_1)
-    plt.close(fig1)
+    # Render the template and pass chart image paths
+    return render_template("superUser_summary.html", plot_path_1=plot_path_1, plot_path_2=plot_path_2, plot_path_3=plot_path_3, plot_path_4=plot_path_4, plot_path_5=plot_path_5, **page)
 
-    # --- Chart 2: Parking Reservations Over Time ---
 
-    reservation_times = [r.parking_timestamp.strftime('%Y-%m-%d') for r in reservations]# This line creates a list of dates (as strings) from all the reservation timestamps.
-    unique_dates = list(set(reservation_times))# Get unique dates from reservation timestamps
-    reservations_per_day = [reservation_times.count(date) for date in unique_dates]# Count reservations for each unique date
+@bp.route('/superUsersummary/<uid>/data', methods=['GET'])
+def superUsersummarydata(uid):
+    user = acting_user()
+    if not user or not user.is_superUser:
+        return jsonify({'error': 'Only superusers can access this data.'}), 403
 
-    fig2, ax2 = plt.subplots()
-    ax2.plot(unique_dates, reservations_per_day, marker='o', color='green')
-    ax2.set_xlabel('Date')
-    ax2.set_ylabel('Reservations Count')
-    ax2.set_title('Parking Reservations Over Time')
+    start, end = parse_date_range()
+    return chart_data_response('global', lambda: superuser_chart_data(start, end), variant=f'|{start}|{end}')
 
-    plot_path_2 = "static/reservations_over_time.png"
-    fig2.savefig(plot_path_2)
-    plt.close(fig2)
 
-    # --- Chart 3: Revenue collected from each Parking Lot over time ---
+@bp.route('/superUseroccupancy/<uid>/<lot_id>', methods=['GET'])
+@login_required
+def superUseroccupancy(uid, lot_id):
+    user = acting_user()
+    if not user.is_superUser:
+            flash("⚠️ Access Denied: Only superusers can access this page.")
+            return redirect(f"/userdashboard/{user.uid}") 
 
-    # Step 1: Create a dictionary to hold revenue totals per lot
-    lot_revenue = {}
+    lot = ParkingLot.query.filter_by(pl_id=lot_id).first()
+    if not lot:
+        flash("Parking lot not found.")
+        return redirect(f'/superUserdashboard/{user.uid}')
 
-    for res in reservations:
-        if res.spot and res.spot.parking_lot and res.parking_cost:
-            lot_name = res.spot.parking_lot.lot_name
-            if lot_name in lot_revenue:
-                lot_revenue[lot_name] += res.parking_cost # Add to existing revenue
-            else:
-                lot_revenue[lot_name] = res.parking_cost # create new entry
+    return render_template('lot_occupancy.html', user=user, lot=lot, occupancy=lot_occupancy(lot))
 
-    # Step 2: Prepare data for chart
-    lot_names = list(lot_revenue.keys())
-    revenues = list(lot_revenue.values())
 
-    # Step 3: Create bar chart
-    fig3, ax3 = plt.subplots()
-    ax3.bar(lot_names, revenues, color='purple', edgecolor='black', width=0.4)
-    ax3.set_xlabel('Parking Lot')
-    ax3.set_ylabel('Total Revenue Collected (₹)')
-    ax3.set_title('Total Revenue from Each Parking Lot')
+@bp.route('/superUseroccupancy/<uid>/<lot_id>/data', methods=['GET'])
+def superUseroccupancydata(uid, lot_id):
+    user = acting_user()
+    if not user or not user.is_superUser:
+        return jsonify({'error': 'Only superusers can access this data.'}), 403
 
-    plot_path_3 = "static/revenue_per_lot.png"
-    fig3.tight_layout()
-    fig3.savefig(plot_path_3)
-    plt.close(fig3)
+    lot = ParkingLot.query.filter_by(pl_id=lot_id).first()
+    if not lot:
+        return jsonify({'error': 'Parking lot not found.'}), 404
 
-    # Render the template and pass chart image paths
-    return render_template("superUser_summary.html", user=user, parking_lots=parking_lots, parking_spots=parking_spots, reservations=reservations, plot_path_1=plot_path_1, plot_path_2=plot_path_2, plot_path_3=plot_path_3)
+    return jsonify(lot_occupancy(lot))
 
 
 # -------------------------------------------------------
@@ -823,7 +3035,49 @@ def create_admin():
         print("ℹ️ Admin user already exists.")
 
 
+@bp.cli.command('init-db')
+def init_db_command():
+    """Create the schema and the admin user in a new database."""
+    if db.inspect(db.engine).has_table(User.__tablename__):
+        raise SystemExit("The database already exists; bring it up to date with: flask db upgrade")
+    db.create_all()
+    stamp()  # the new schema already matches the latest migration
+    create_admin()
+    print("✅ Database created.")
+
+
+def reset_worker_caches():
+    # The per-worker caches describe one database, and a new app may point at another
+    with _lot_directory_lock:
+        _lot_directory['current'] = None
+    with _hold_index_lock:
+        _hold_index.clear()
+    with _user_cache_lock:
+        _user_cache['generation'] += 1
+        _user_cache['users'].clear()
+
+
+def create_app(config=Config):
+    app = Flask(__name__)
+    app.config.from_object(config)
+    # Any setting can be overridden from the environment with a PARKEASE_ prefix,
+    # e.g. PARKEASE_SQLALCHEMY_DATABASE_URI or PARKEASE_LOCK_RETRY_ATTEMPTS=0 (JSON values)
+    app.config.from_prefixed_env('PARKEASE')
+    if app.config['SECRET_KEY_REQUIRED'] and app.config['SECRET_KEY'] in (None, '', DEFAULT_SECRET_KEY):
+        raise RuntimeError("Set PARKEASE_SECRET_KEY to a long random value, e.g. the output of: "
+                           "python -c \"import secrets; print(secrets.token_hex())\"")
+
+    db.init_app(app)
+    migrate.init_app(app, db)
+    app.register_blueprint(bp)
+    reset_worker_caches()
+    with app.app_context():
+        register_engine_events(app, db.engine)
+    return app
+
 
 if __name__ == '__main__':
-    create_admin()  # Create admin if it doesn't exist
-    app.run(debug=True)
+    app = create_app(DevelopmentConfig)
+    with app.app_context():
+        create_admin()  # Create admin if it doesn't exist
+    app.run()
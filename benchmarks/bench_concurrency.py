@@ -0,0 +1,137 @@
+"""Booking throughput under concurrent writers and readers.
+
+Runs WRITERS processes that book and release a spot in a loop through
+/booklot and /releaseparkingspot, next to READERS processes that keep
+loading the user dashboard, all against a scratch SQLite database. Each
+mode gets a fresh database:
+
+  rollback journal  the previous setup: journal_mode=DELETE, synchronous=FULL,
+                    no lock retries
+  wal               the current defaults from config.py
+
+Requests that end in an error (e.g. "database is locked") count as failed.
+
+Run from the project root: python benchmarks/bench_concurrency.py [seconds] [writers] [readers]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault('PARKEASE_SECRET_KEY', 'benchmark')  # create_app() requires one outside development
+
+SECONDS = 5
+WRITERS = 4
+READERS = 4
+SPOTS = 50
+
+# Environment overrides (see create_app) for each mode
+MODES = {
+    'rollback journal': {'PARKEASE_SQLITE_JOURNAL_MODE': 'DELETE', 'PARKEASE_SQLITE_SYNCHRONOUS': 'FULL',
+                         'PARKEASE_LOCK_RETRY_ATTEMPTS': '0'},
+    'wal': {},
+}
+
+
+def load_app(database, settings):
+    # Settings are read from the environment when the app is created
+    os.environ['PARKEASE_SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{database}'
+    os.environ.update(settings)
+    import app as parkease
+    return parkease, parkease.create_app()
+
+
+def setup(database, settings, clients, results):
+    # Runs in its own process, like the clients, so nothing is shared across the spawn
+    parkease, app = load_app(database, settings)
+    db = parkease.db
+    with app.app_context():
+        db.create_all()
+        users = [parkease.User(username=f'bench-{i}', password='-', name=f'Bench {i}',
+                               phone=f'9{i:09d}', address=f'bench {i}', pincode='000000')
+                 for i in range(clients)]
+        db.session.add_all(users)
+        db.session.flush()
+        for user in users:
+            user.username = f'bench{user.uid}@parkease'  # clients log in by uid
+        lot = parkease.ParkingLot(lot_name='bench-lot', address='bench-lot', pin_code='000000', price_per_hour=20.0,
+                                  max_spots=SPOTS, available_count=SPOTS, user_id=users[0].uid)
+        db.session.add(lot)
+        db.session.flush()
+        parkease.provision_spots(lot.pl_id, 1, SPOTS)
+        db.session.commit()
+        uids, lot_id = [user.uid for user in users], lot.pl_id
+        db.engine.dispose()
+    results.put((uids, lot_id))
+
+
+def client_loop(database, settings, role, uid, lot_id, seconds, barrier, results):
+    parkease, app = load_app(database, settings)
+    db, Reservation = parkease.db, parkease.Reservation
+    client = app.test_client()
+    client.post('/login', data={'username': f'bench{uid}@parkease', 'password': '-'})
+    done = failed = 0
+
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        if role == 'writer':
+            booked = client.post(f'/booklot/{uid}/{lot_id}', data={'vehicle_number': f'BENCH{uid}'})
+            with app.app_context():
+                reservation_id = db.session.execute(db.select(Reservation.id).where(
+                    Reservation.user_id == uid, Reservation.status == 'Active')).scalar()
+                db.session.rollback()
+            if booked.status_code >= 500 or reservation_id is None:
+                failed += 1
+                continue
+            released = client.post(f'/releaseparkingspot/{reservation_id}')
+            ok = released.status_code < 500
+        else:
+            ok = client.get(f'/userdashboard/{uid}').status_code < 500
+        done += ok
+        failed += not ok
+
+    results.put((role, done, failed))
+
+
+def run(mode, seconds, writers, readers):
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as scratch:
+        database = os.path.join(scratch, 'bench.db')
+        settings = MODES[mode]
+        results = context.Queue()
+        process = context.Process(target=setup, args=(database, settings, writers + readers, results))
+        process.start()
+        uids, lot_id = results.get()
+        process.join()
+
+        barrier = context.Barrier(writers + readers)
+        roles = ['writer'] * writers + ['reader'] * readers
+        processes = [context.Process(target=client_loop,
+                                     args=(database, settings, role, uid, lot_id, seconds, barrier, results))
+                     for role, uid in zip(roles, uids)]
+        for process in processes:
+            process.start()
+        totals = {('writer', True): 0, ('writer', False): 0, ('reader', True): 0, ('reader', False): 0}
+        for _ in processes:
+            role, done, failed = results.get()
+            totals[(role, True)] += done
+            totals[(role, False)] += failed
+        for process in processes:
+            process.join()
+
+    print(f"{mode:>17} {totals[('writer', True)] / seconds:>13.1f} {totals[('reader', True)] / seconds:>10.1f} "
+          f"{totals[('writer', False)] + totals[('reader', False)]:>8}")
+
+
+if __name__ == '__main__':
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else SECONDS
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else WRITERS
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else READERS
+
+    print(f"{'mode':>17} {'book+release/s':>13} {'reads/s':>10} {'failed':>8}")
+    for mode in MODES:
+        run(mode, seconds, writers, readers)
@@ -0,0 +1,52 @@
+"""Request instrumentation overhead.
+
+Times a few read-only routes through the Flask test client with
+METRICS_ENABLED off and on, interleaving the two so caches and the
+SQLite page cache warm up equally. The admin user is created if it
+does not exist yet, and the client logs in as the admin.
+
+Run from the project root: python benchmarks/bench_metrics_overhead.py [requests]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PARKEASE_SECRET_KEY', 'benchmark')  # create_app() requires one outside development
+
+from app import create_app, create_admin, User
+
+REQUESTS = 500
+ROUNDS = 5
+
+
+def timed(client, paths, requests):
+    start = time.perf_counter()
+    for i in range(requests):
+        client.get(paths[i % len(paths)])
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS
+    app = create_app()
+
+    with app.app_context():
+        create_admin()
+        admin = User.query.filter_by(is_superUser=True).first()
+        credentials = {'username': admin.username, 'password': admin.password}
+        admin = admin.uid
+    paths = [f'/allusers/{admin}', f'/lotsearch/{admin}?q=7', '/']
+    client = app.test_client()
+    client.post('/login', data=credentials)
+    timed(client, paths, len(paths))  # warm the per-worker caches before timing
+
+    totals = {False: 0.0, True: 0.0}
+    for _ in range(ROUNDS):
+        for enabled in (False, True):
+            app.config['METRICS_ENABLED'] = enabled
+            totals[enabled] += timed(client, paths, requests)
+
+    for enabled, label in ((False, 'metrics off'), (True, 'metrics on')):
+        print(f"{label:>12}: {totals[enabled] / (ROUNDS * requests) * 1e6:8.1f} µs/request")
+    print(f"{'overhead':>12}: {(totals[True] / totals[False] - 1) * 100:8.1f} %")
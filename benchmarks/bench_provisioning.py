@@ -0,0 +1,61 @@
+"""Spot provisioning time against lot size.
+
+Compares the old one-ORM-object-per-spot loop with the set-based
+provision_spots/remove_free_spots path. Everything runs inside a
+transaction that is rolled back, so the database is left untouched.
+
+Run from the project root: python benchmarks/bench_provisioning.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PARKEASE_SECRET_KEY', 'benchmark')  # create_app() requires one outside development
+
+from app import create_app, db, User, ParkingLot, ParkingSpot, provision_spots, remove_free_spots
+
+LOT_SIZES = [100, 1000, 5000, 20000]
+
+
+def new_lot(name, size):
+    owner = User.query.filter_by(is_superUser=True).first() or User.query.first()
+    lot = ParkingLot(lot_name=name, address=name, pin_code='000000', price_per_hour=1.0,
+                     max_spots=size, available_count=size, user_id=owner.uid if owner else 0)
+    db.session.add(lot)
+    db.session.flush()
+    return lot
+
+
+def orm_loop(size):
+    lot = new_lot(f'bench-orm-{size}', size)
+    for i in range(1, size + 1):
+        db.session.add(ParkingSpot(lot_id=lot.pl_id, status='A', spot_number=i))
+    db.session.flush()
+
+    for spot in ParkingSpot.query.filter_by(lot_id=lot.pl_id, status='A').all():
+        db.session.delete(spot)
+    db.session.flush()
+
+
+def set_based(size):
+    lot = new_lot(f'bench-bulk-{size}', size)
+    provision_spots(lot.pl_id, 1, size)
+    remove_free_spots(lot.pl_id, size)
+
+
+def timed(fn, size):
+    start = time.perf_counter()
+    fn(size)
+    elapsed = time.perf_counter() - start
+    db.session.rollback()
+    return elapsed
+
+
+if __name__ == '__main__':
+    with create_app().app_context():
+        print(f"{'spots':>8} {'orm loop (s)':>14} {'set-based (s)':>14} {'speedup':>8}")
+        for size in LOT_SIZES:
+            orm = timed(orm_loop, size)
+            bulk = timed(set_based, size)
+            print(f"{size:>8} {orm:>14.3f} {bulk:>14.3f} {orm / bulk:>7.1f}x")
@@ -0,0 +1,59 @@
+"""Startup cost: importing app.py, creating the app and serving a first request.
+
+Each measurement runs in a fresh interpreter, so nothing is cached
+between rounds, and the median of ROUNDS runs is reported. The first
+request is GET /login, which renders a template and queries the
+database. Trees without create_app (before the factory) are measured
+through their module-level app instead.
+
+To compare against an older revision, check it out next to this one
+and pass both trees:
+
+    git worktree add /tmp/parkease-before <revision>
+    python benchmarks/bench_startup.py /tmp/parkease-before .
+
+Run from the project root: python benchmarks/bench_startup.py [project_dir ...]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault('PARKEASE_SECRET_KEY', 'benchmark')  # create_app() requires one outside development
+ROUNDS = 5
+
+MEASURE = """
+import json, sys, time
+sys.path.insert(0, '.')
+started = time.perf_counter()
+import app as parkease
+imported = time.perf_counter()
+application = parkease.create_app() if hasattr(parkease, 'create_app') else parkease.app
+created = time.perf_counter()
+application.test_client().get('/login')
+served = time.perf_counter()
+print(json.dumps({'import': imported - started, 'create app': created - imported, 'first request': served - created,
+                  'matplotlib loaded': 'matplotlib' in sys.modules}))
+"""
+
+
+def measure(project_dir):
+    runs = []
+    for _ in range(ROUNDS):
+        output = subprocess.run([sys.executable, '-c', MEASURE], cwd=project_dir, check=True,
+                                capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(run[key] for run in runs) for key in ('import', 'create app', 'first request')}, \
+        runs[-1]['matplotlib loaded']
+
+
+if __name__ == '__main__':
+    project_dirs = sys.argv[1:] or [ROOT]
+
+    print(f"{'project':>30} {'import (s)':>11} {'create app (s)':>15} {'first request (s)':>18} {'total (s)':>10} {'matplotlib':>11}")
+    for project_dir in project_dirs:
+        timings, matplotlib_loaded = measure(project_dir)
+        print(f"{os.path.abspath(project_dir)[-30:]:>30} {timings['import']:>11.3f} {timings['create app']:>15.3f} "
+              f"{timings['first request']:>18.3f} {sum(timings.values()):>10.3f} {'yes' if matplotlib_loaded else 'no':>11}")
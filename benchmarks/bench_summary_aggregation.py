@@ -0,0 +1,97 @@
+"""superUsersummary aggregation time against reservation count.
+
+Fills the reservations table with synthetic released reservations (one
+year of start times spread over a 500-spot lot) and times the GROUP BY
+based superuser_chart_data against the previous load-everything-into-
+Python aggregation. The legacy path is only timed up to LEGACY_MAX rows
+because its daily count is quadratic. Everything runs inside a
+transaction that is rolled back.
+
+Run from the project root: python benchmarks/bench_summary_aggregation.py [sizes...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PARKEASE_SECRET_KEY', 'benchmark')  # create_app() requires one outside development
+
+from app import create_app, db, User, ParkingLot, ParkingSpot, Reservation, provision_spots, superuser_chart_data
+
+SIZES = [10_000, 100_000, 1_000_000]
+LEGACY_MAX = 100_000
+SPOTS = 500
+
+SYNTHETIC_RESERVATIONS = db.text("""
+    WITH RECURSIVE seq(n) AS (SELECT :first UNION ALL SELECT n + 1 FROM seq WHERE n < :last)
+    INSERT INTO reservations (parking_timestamp, leaving_timestamp, parking_cost, status, vehicle_number, spot_id, user_id)
+    SELECT datetime('2025-01-01', '+' || (n * 7 % 525600) || ' minutes'),
+           datetime('2025-01-01', '+' || (n * 7 % 525600 + n % 330) || ' minutes'),
+           (n % 330 / 60 + 1) * 20.0,
+           'Released',
+           'BENCH' || n,
+           :first_spot + n % :spots,
+           :uid
+    FROM seq
+""")
+
+
+def legacy_aggregation():
+    # The pre-GROUP BY superUsersummary data path, without the plotting
+    parking_spots = ParkingSpot.query.all()
+    reservations = Reservation.query.all()
+
+    available_spots = len([ps for ps in parking_spots if ps.status == 'A'])
+    occupied_spots = len([ps for ps in parking_spots if ps.status == 'O'])
+
+    reservation_times = [r.parking_timestamp.strftime('%Y-%m-%d') for r in reservations]
+    unique_dates = list(set(reservation_times))
+    reservations_per_day = [reservation_times.count(date) for date in unique_dates]
+
+    lot_revenue = {}
+    for res in reservations:
+        if res.spot and res.spot.parking_lot and res.parking_cost:
+            lot_name = res.spot.parking_lot.lot_name
+            lot_revenue[lot_name] = lot_revenue.get(lot_name, 0) + res.parking_cost
+
+    return available_spots, occupied_spots, reservations_per_day, lot_revenue
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+
+    with create_app().app_context():
+        user = User(username='bench@parkease', password='-', name='Bench', phone='bench', address='bench', pincode='000000')
+        db.session.add(user)
+        db.session.flush()
+        lot = ParkingLot(lot_name='bench-lot', address='bench-lot', pin_code='000000', price_per_hour=20.0,
+                         max_spots=SPOTS, available_count=SPOTS, user_id=user.uid)
+        db.session.add(lot)
+        db.session.flush()
+        provision_spots(lot.pl_id, 1, SPOTS)
+        first_spot = db.session.execute(db.select(db.func.min(ParkingSpot.ps_id)).where(ParkingSpot.lot_id == lot.pl_id)).scalar()
+
+        print(f"{'reservations':>12} {'legacy (s)':>11} {'group by (s)':>13}")
+        inserted = 0
+        try:
+            for size in sorted(sizes):
+                db.session.execute(SYNTHETIC_RESERVATIONS, {
+                    'first': inserted + 1, 'last': size, 'first_spot': first_spot, 'spots': SPOTS, 'uid': user.uid
+                })
+                inserted = size
+
+                sql_time = timed(superuser_chart_data)
+                if size <= LEGACY_MAX:
+                    legacy_time = f'{timed(legacy_aggregation):>11.3f}'
+                    db.session.expunge_all()
+                else:
+                    legacy_time = f'{"skipped":>11}'
+                print(f"{size:>12} {legacy_time} {sql_time:>13.3f}")
+        finally:
+            db.session.rollback()
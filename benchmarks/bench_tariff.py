@@ -0,0 +1,80 @@
+"""Tariff pricing time against the number of stays billed.
+
+Builds a weekday peak / overnight discount / long-stay tier schedule and
+prices random stays of up to three days three ways: walking the stay
+hour by hour in Python, one pricing.interval_cost lookup per stay, and a
+single pricing.batch_costs call. The hour-by-hour walk is only timed up
+to WALK_MAX stays. No database is needed.
+
+Run from the project root: python benchmarks/bench_tariff.py [sizes...]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pricing
+
+SIZES = [1_000, 10_000, 100_000]
+WALK_MAX = 10_000
+PRICE = 20.0
+SCHEDULE = {
+    'time_of_day': [
+        {'from': 8, 'to': 20, 'multiplier': 1.5, 'days': [0, 1, 2, 3, 4]},
+        {'from': 22, 'to': 6, 'multiplier': 0.5},
+    ],
+    'tiers': [{'after': 3, 'multiplier': 0.8}, {'after': 12, 'multiplier': 0.5}],
+}
+
+
+def walk_cost(start, end):
+    # Reference pricing: every billed hour looked up on its own
+    total = 0.0
+    for i in range(pricing.billed_hours(start, end)):
+        moment = start + timedelta(hours=i)
+        hour_cost = PRICE
+        for rule in SCHEDULE['time_of_day']:
+            day, hour = moment.weekday(), moment.hour
+            if rule['from'] >= rule['to'] and hour < rule['to']:
+                day, hour = (day - 1) % 7, hour + 24
+            end_hour = rule['to'] if rule['from'] < rule['to'] else rule['to'] + 24
+            if day in rule.get('days', range(7)) and rule['from'] <= hour < end_hour:
+                hour_cost = PRICE * rule['multiplier']
+        tier_multiplier = 1.0
+        for tier in SCHEDULE['tiers']:
+            if i >= tier['after']:
+                tier_multiplier = tier['multiplier']
+        total += hour_cost * tier_multiplier
+    return total
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    tariff = pricing.compile_tariff(PRICE, SCHEDULE)
+    rng = random.Random(42)
+    base = datetime(2025, 1, 1)
+
+    print(f"{'stays':>8} {'hourly walk (s)':>16} {'per stay (s)':>13} {'batch (s)':>10}")
+    for size in sorted(sizes):
+        starts = [base + timedelta(minutes=rng.randrange(525600)) for _ in range(size)]
+        ends = [start + timedelta(minutes=rng.randrange(1, 4320)) for start in starts]
+
+        single_time, single = timed(lambda: [pricing.interval_cost(tariff, s, e) for s, e in zip(starts, ends)])
+        batch_time, batch = timed(lambda: pricing.batch_costs(tariff, starts, ends))
+        assert all(abs(a - b) < 1e-6 for a, b in zip(single, batch))
+        if size <= WALK_MAX:
+            walk_time, walked = timed(lambda: [walk_cost(s, e) for s, e in zip(starts, ends)])
+            assert all(abs(a - b) < 1e-6 for a, b in zip(single, walked))
+            walk_time = f'{walk_time:>16.3f}'
+        else:
+            walk_time = f'{"skipped":>16}'
+        print(f"{size:>8} {walk_time} {single_time:>13.3f} {batch_time:>10.3f}")
@@ -0,0 +1,76 @@
+"""Account lookups per request, with and without the identity cache.
+
+Logs in as the first non-admin user (the admin when there is none) and
+times the pages that user can open through the Flask test client, with
+USER_CACHE_TTL set to 0 (a query for the acting user on every request)
+and to the configured TTL, interleaving the two so caches and the SQLite
+page cache warm up equally. Also counts the statements each request runs.
+
+Run from the project root: python benchmarks/bench_user_cache.py [requests]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PARKEASE_SECRET_KEY', 'benchmark')  # create_app() requires one outside development
+
+from sqlalchemy import event
+
+from app import create_app, create_admin, db, invalidate_user, User
+
+REQUESTS = 500
+ROUNDS = 5
+
+
+def use_ttl(app, uid, cache_ttl):
+    # The TTL is applied when an entry is stored, so drop the one cached under the old TTL
+    app.config['USER_CACHE_TTL'] = cache_ttl
+    invalidate_user(uid)
+
+
+def timed(client, paths, requests):
+    start = time.perf_counter()
+    for i in range(requests):
+        client.get(paths[i % len(paths)])
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS
+    app = create_app()
+    ttl = app.config['USER_CACHE_TTL']
+
+    with app.app_context():
+        create_admin()
+        user = User.query.order_by(User.is_superUser, User.uid).first()
+        credentials = {'username': user.username, 'password': user.password}
+        uid, is_superuser = user.uid, user.is_superUser
+        engine = db.engine
+    if is_superuser:
+        paths = [f'/allusers/{uid}', f'/lotsearch/{uid}?q=7']
+    else:
+        paths = [f'/userdashboard/{uid}', f'/lotsearch/{uid}?q=7']
+    client = app.test_client()
+    client.post('/login', data=credentials)
+    timed(client, paths, len(paths))  # warm the per-worker caches before timing
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *args: statements.append(1))
+    counts = {}
+    for cache_ttl in (0, ttl):
+        use_ttl(app, uid, cache_ttl)
+        statements.clear()
+        timed(client, paths, len(paths) * 10)
+        counts[cache_ttl] = len(statements) / (len(paths) * 10)
+
+    totals = {0: 0.0, ttl: 0.0}
+    for _ in range(ROUNDS):
+        for cache_ttl in (0, ttl):
+            use_ttl(app, uid, cache_ttl)
+            totals[cache_ttl] += timed(client, paths, requests)
+
+    for cache_ttl, label in ((0, 'no cache'), (ttl, f'ttl {ttl}s')):
+        print(f"{label:>12}: {totals[cache_ttl] / (ROUNDS * requests) * 1e6:8.1f} µs/request, "
+              f"{counts[cache_ttl]:.1f} statements/request")
+    print(f"{'saving':>12}: {(1 - totals[ttl] / totals[0]) * 100:8.1f} %")
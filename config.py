@@ -0,0 +1,71 @@
+# Only good enough for development and tests: anyone who knows it can forge a login
+DEFAULT_SECRET_KEY = 'sweet_and_sour'
+
+
+class Config:
+    # Signs the session cookie that keeps users logged in, and flash messages. Set it
+    # with PARKEASE_SECRET_KEY; create_app() refuses to start without a real one
+    # unless SECRET_KEY_REQUIRED is off, as in development and testing.
+    SECRET_KEY = None
+    SECRET_KEY_REQUIRED = True
+
+    # Logins are kept in Flask's signed session cookie
+    SESSION_COOKIE_SAMESITE = 'Lax'
+    # Seconds an account looked up by one worker is reused before it is read again.
+    # A worker forgets its copy at once when it changes the account itself; 0 turns caching off.
+    USER_CACHE_TTL = 60
+
+    # Configure the database
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///parkease.db'
+
+    # Applied to every new SQLite connection. WAL lets readers carry on while a booking
+    # writes; NORMAL sync is durable across app crashes and only risks the last commits
+    # on power loss. A writer waits up to the busy timeout for the lock before failing.
+    SQLITE_JOURNAL_MODE = 'WAL'
+    SQLITE_SYNCHRONOUS = 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = 5000
+    # One pooled connection per worker thread, with headroom for CLI-style bursts
+    SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': 8, 'max_overflow': 8, 'pool_timeout': 30}
+    # Booking and release requests that still hit "database is locked" are rerun from
+    # scratch this many times, backing off exponentially from the base delay (seconds)
+    LOCK_RETRY_ATTEMPTS = 4
+    LOCK_RETRY_BASE_DELAY = 0.05
+
+    # Rendered summary charts are cached under static/charts, keyed by data version
+    CHART_CACHE_MAX_FILES = 200
+    CHART_CACHE_MAX_BYTES = 50 * 1024 * 1024
+    # Summary charts are drawn in the browser from JSON; set to True to render PNGs with matplotlib instead.
+    # A single view can also opt in with ?format=png.
+    SERVER_SIDE_CHARTS = False
+
+    # Active reservations allowed per account, unless the account has its own limit set
+    MAX_ACTIVE_RESERVATIONS = 4
+    # Most vehicles accepted in one fleet booking request
+    MAX_FLEET_BOOKING = 100
+
+    # Per-request latency, SQL, chart and template timings, served at /metrics for Prometheus
+    METRICS_ENABLED = True
+
+    # Statements slower than this (seconds) are written with their query plan to a
+    # rotating JSON-lines log; see `flask slow-query-report`. None turns the log off.
+    SLOW_QUERY_SECONDS = 0.1
+    # None keeps the log in the instance folder as slow_queries.jsonl
+    SLOW_QUERY_LOG = None
+    SLOW_QUERY_LOG_MAX_BYTES = 5 * 1024 * 1024
+    SLOW_QUERY_LOG_BACKUPS = 3
+
+
+class DevelopmentConfig(Config):
+    # Used by `python app.py`
+    DEBUG = True
+    SECRET_KEY = DEFAULT_SECRET_KEY
+    SECRET_KEY_REQUIRED = False
+
+
+class TestingConfig(Config):
+    TESTING = True
+    SECRET_KEY = DEFAULT_SECRET_KEY
+    SECRET_KEY_REQUIRED = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///parkease-test.db'
+    METRICS_ENABLED = False
+    SLOW_QUERY_SECONDS = None
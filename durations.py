@@ -0,0 +1,43 @@
+from bisect import bisect_right
+
+# Parking duration histogram buckets, shared by the summary charts, the per-user
+# statistics and the migration that backfills them, so a stay lands in the same
+# bucket whichever of them counted it.
+#
+# SQLite stores timestamps as 'YYYY-MM-DD HH:MM:SS.ffffff' text. The SQL below
+# measures a stay in whole microseconds from that text: julianday() differences
+# are floats, and their rounding error puts stays that end exactly on a bin edge
+# one bucket low.
+
+DURATION_BINS = [0, 30, 60, 90, 120, 150, 180, 210, 240, 270, 300]  # minutes
+BIN_MICROSECONDS = (DURATION_BINS[1] - DURATION_BINS[0]) * 60 * 1000000
+
+
+def duration_bin(minutes):
+    # Index into DURATION_BINS with matplotlib hist semantics: right-open bins except
+    # the last, which also takes its upper edge; out-of-range durations get None
+    if not DURATION_BINS[0] <= minutes <= DURATION_BINS[-1]:
+        return None
+    return min(bisect_right(DURATION_BINS, minutes) - 1, len(DURATION_BINS) - 2)
+
+
+def microseconds_sql(timestamp):
+    # Microseconds since the epoch of a timestamp column; the fraction may be missing.
+    # strftime() rounds fractions to milliseconds, so it only gets the whole seconds
+    return (f"(strftime('%s', substr({timestamp}, 1, 19)) * 1000000"
+            f" + CAST(substr({timestamp} || '.000000', 21, 6) AS INTEGER))")
+
+
+def stay_microseconds_sql(start, end):
+    return f"({microseconds_sql(end)} - {microseconds_sql(start)})"
+
+
+def duration_in_range_sql(stay):
+    # The stay (in microseconds) falls inside DURATION_BINS, both edges included
+    return f"{stay} BETWEEN {DURATION_BINS[0] * 60 * 1000000} AND {DURATION_BINS[-1] * 60 * 1000000}"
+
+
+def duration_bucket_sql(stay):
+    # duration_bin() in SQL for a stay in microseconds. The bins are evenly spaced, so
+    # the bucket is integer division; the last bucket also takes its upper edge
+    return f"MIN(({stay} - {DURATION_BINS[0] * 60 * 1000000}) / {BIN_MICROSECONDS}, {len(DURATION_BINS) - 2})"
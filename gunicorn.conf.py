@@ -0,0 +1,29 @@
+import multiprocessing
+import os
+
+# Gunicorn settings for ParkEase: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# SQLite accepts one writer at a time, so more processes mostly add readers.
+# A few processes with a handful of threads each keep the write queue short,
+# while WAL mode lets dashboards and searches read alongside a booking.
+
+bind = os.environ.get('PARKEASE_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('PARKEASE_WORKERS', min(4, multiprocessing.cpu_count() + 1)))
+worker_class = 'gthread'
+# Each thread holds one pooled connection: keep this at or below pool_size in config.py
+threads = int(os.environ.get('PARKEASE_THREADS', 4))
+
+# Longer than the SQLite busy timeout plus the lock retries, so a worker waiting
+# on a write lock is never killed mid-request
+timeout = 30
+graceful_timeout = 30
+
+# Every worker imports the app itself, so no SQLite connection or per-worker
+# cache is ever shared across a fork
+preload_app = False
+
+# Recycle workers now and then to cap any slow growth of per-worker caches
+max_requests = 1000
+max_requests_jitter = 100
+
+accesslog = '-'
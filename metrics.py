@@ -0,0 +1,57 @@
+import threading
+from bisect import bisect_left
+
+# In-process Prometheus histograms, rendered in the text exposition format.
+#
+# Each worker process keeps its own counts; Prometheus scrapes every worker (or
+# sums them) the way it does for any multi-process exporter. observe() is a
+# bisect and three additions under a lock, cheap enough to run on every request.
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, label='endpoint'):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label = label
+        # label value -> [count per bucket..., count above the last bucket, sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        index = bisect_left(self.buckets, value)  # first bucket with value <= le
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        bounds = [repr(float(bound)) for bound in self.buckets] + ['+Inf']
+        for label_value, series in sorted(snapshot.items()):
+            label = f'{self.label}="{_label(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label}}} {series[-1]!r}')
+            lines.append(f'{self.name}_count{{{label}}} {cumulative}')
+        return '\n'.join(lines)
+
+
+def render(histograms):
+    return '\n'.join(histogram.render() for histogram in histograms) + '\n'
@@ -0,0 +1,26 @@
+"""add spot holds vehicle index
+
+Revision ID: 2e8c5a7d9b14
+Revises: f1d7b3a9c046
+Create Date: 2026-10-18 14:21:09.418352
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e8c5a7d9b14'
+down_revision = 'f1d7b3a9c046'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('spot_holds', schema=None) as batch_op:
+        batch_op.create_index('ix_spot_holds_vehicle_number_status_start_time', ['vehicle_number', 'status', 'start_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('spot_holds', schema=None) as batch_op:
+        batch_op.drop_index('ix_spot_holds_vehicle_number_status_start_time')
@@ -0,0 +1,47 @@
+"""add spot holds
+
+Revision ID: 4a6f0c2d8e19
+Revises: 7d2c8e4b1f63
+Create Date: 2026-10-18 09:17:05.839120
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a6f0c2d8e19'
+down_revision = '7d2c8e4b1f63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() (init-db, or older app.py on import) may
+    # already have the table
+    if sa.inspect(op.get_bind()).has_table('spot_holds'):
+        return
+
+    op.create_table('spot_holds',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('start_time', sa.DateTime(), nullable=False),
+        sa.Column('end_time', sa.DateTime(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('vehicle_number', sa.String(length=20), nullable=False),
+        sa.Column('spot_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['spot_id'], ['parking_spot.ps_id'], ),
+        sa.ForeignKeyConstraint(['user_id'], ['user_details.uid'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('spot_holds', schema=None) as batch_op:
+        batch_op.create_index('ix_spot_holds_spot_id_status_start_time', ['spot_id', 'status', 'start_time'], unique=False)
+        batch_op.create_index('ix_spot_holds_user_id_status_end_time', ['user_id', 'status', 'end_time'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('spot_holds', schema=None) as batch_op:
+        batch_op.drop_index('ix_spot_holds_user_id_status_end_time')
+        batch_op.drop_index('ix_spot_holds_spot_id_status_start_time')
+
+    op.drop_table('spot_holds')
@@ -0,0 +1,74 @@
+"""add user stats
+
+Revision ID: 5c2e81d4f0b7
+Revises: ac7c9528bce8
+Create Date: 2026-10-18 07:41:27.903118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import durations
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e81d4f0b7'
+down_revision = 'ac7c9528bce8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() may already have the (empty) table
+    inspector = sa.inspect(op.get_bind())
+    if not inspector.has_table('user_stats'):
+        op.create_table('user_stats',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('kind', sa.String(length=10), nullable=False),
+            sa.Column('key', sa.String(length=20), nullable=False),
+            sa.Column('value', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user_details.uid'], ),
+            sa.PrimaryKeyConstraint('user_id', 'kind', 'key')
+        )
+
+    if op.get_bind().execute(sa.text("SELECT 1 FROM user_stats LIMIT 1")).first():
+        return
+
+    # Backfill from the existing reservations, as rebuild_user_stats() does: bookings per
+    # day, active/released counts, spend per lot and 30-minute duration buckets up to 300
+    op.execute("""
+        INSERT INTO user_stats (user_id, kind, key, value)
+        SELECT user_id, 'day', date(parking_timestamp), COUNT(id)
+        FROM reservations GROUP BY user_id, date(parking_timestamp)
+    """)
+    op.execute("""
+        INSERT INTO user_stats (user_id, kind, key, value)
+        SELECT user_id, 'status', CASE WHEN status = 'Active' THEN 'Active' ELSE 'Released' END, COUNT(id)
+        FROM reservations GROUP BY user_id, CASE WHEN status = 'Active' THEN 'Active' ELSE 'Released' END
+    """)
+    op.execute("""
+        INSERT INTO user_stats (user_id, kind, key, value)
+        SELECT reservations.user_id, 'lot', CAST(parking_spot.lot_id AS VARCHAR), SUM(reservations.parking_cost)
+        FROM reservations JOIN parking_spot ON reservations.spot_id = parking_spot.ps_id
+        WHERE reservations.status != 'Active' AND reservations.parking_cost > 0
+        GROUP BY reservations.user_id, parking_spot.lot_id
+    """)
+    # Same bucketing as rebuild_user_stats() and the summary charts
+    op.execute(f"""
+        INSERT INTO user_stats (user_id, kind, key, value)
+        SELECT user_id, 'duration', CAST(bucket AS VARCHAR), COUNT(*)
+        FROM (
+            SELECT user_id, {durations.duration_bucket_sql('stay')} AS bucket
+            FROM (
+                SELECT user_id, {durations.stay_microseconds_sql('parking_timestamp', 'leaving_timestamp')} AS stay
+                FROM reservations
+                WHERE status != 'Active' AND leaving_timestamp IS NOT NULL
+            )
+            WHERE {durations.duration_in_range_sql('stay')}
+        )
+        GROUP BY user_id, bucket
+    """)
+
+
+def downgrade():
+    op.drop_table('user_stats')
@@ -0,0 +1,28 @@
+"""add parking lot coordinates
+
+Revision ID: 7d2c8e4b1f63
+Revises: e3f1a7c9d284
+Create Date: 2026-10-18 08:51:37.204816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2c8e4b1f63'
+down_revision = 'e3f1a7c9d284'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,83 @@
+"""add lot rollups
+
+Revision ID: 9b4d3e6a2c51
+Revises: 5c2e81d4f0b7
+Create Date: 2026-10-18 08:02:44.517390
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4d3e6a2c51'
+down_revision = '5c2e81d4f0b7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() may already have the (empty) tables
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('lot_hourly_rollup'):
+        op.create_table('lot_hourly_rollup',
+            sa.Column('lot_id', sa.Integer(), nullable=False),
+            sa.Column('hour', sa.DateTime(), nullable=False),
+            sa.Column('starts', sa.Integer(), nullable=False),
+            sa.Column('occupied_hours', sa.Float(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['lot_id'], ['parking_lot.pl_id'], ),
+            sa.PrimaryKeyConstraint('lot_id', 'hour')
+        )
+
+    if not inspector.has_table('lot_daily_rollup'):
+        op.create_table('lot_daily_rollup',
+            sa.Column('lot_id', sa.Integer(), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('starts', sa.Integer(), nullable=False),
+            sa.Column('occupied_hours', sa.Float(), nullable=False),
+            sa.Column('revenue', sa.Float(), nullable=False),
+            sa.ForeignKeyConstraint(['lot_id'], ['parking_lot.pl_id'], ),
+            sa.PrimaryKeyConstraint('lot_id', 'day')
+        )
+
+    if op.get_bind().execute(sa.text("SELECT 1 FROM lot_hourly_rollup LIMIT 1")).first():
+        return
+
+    # Backfill from the released reservations, as backfill_rollups() does: each one is
+    # split over the clock hours it covered, and its start and cost go to its first hour.
+    # Hours are written in the format SQLAlchemy stores DateTime in, so the app's
+    # upserts later land on the same keys.
+    op.execute("""
+        WITH RECURSIVE hours(lot_id, start, finish, cost, hour) AS (
+            SELECT parking_spot.lot_id, reservations.parking_timestamp, reservations.leaving_timestamp,
+                   COALESCE(reservations.parking_cost, 0.0),
+                   strftime('%Y-%m-%d %H:00:00.000000', reservations.parking_timestamp)
+            FROM reservations JOIN parking_spot ON reservations.spot_id = parking_spot.ps_id
+            WHERE reservations.status != 'Active' AND reservations.leaving_timestamp IS NOT NULL
+            UNION ALL
+            SELECT lot_id, start, finish, cost, strftime('%Y-%m-%d %H:00:00.000000', hour, '+1 hour')
+            FROM hours
+            WHERE julianday(hour, '+1 hour') < julianday(finish)
+        )
+        INSERT INTO lot_hourly_rollup (lot_id, hour, starts, occupied_hours, revenue)
+        SELECT lot_id, hour,
+               SUM(hour = strftime('%Y-%m-%d %H:00:00.000000', start)),
+               SUM(MAX(0.0, (MIN(julianday(finish), julianday(hour, '+1 hour'))
+                             - MAX(julianday(start), julianday(hour))) * 24)),
+               SUM(CASE WHEN hour = strftime('%Y-%m-%d %H:00:00.000000', start) THEN cost ELSE 0.0 END)
+        FROM hours
+        GROUP BY lot_id, hour
+    """)
+    op.execute("""
+        INSERT INTO lot_daily_rollup (lot_id, day, starts, occupied_hours, revenue)
+        SELECT lot_id, date(hour), SUM(starts), SUM(occupied_hours), SUM(revenue)
+        FROM lot_hourly_rollup
+        GROUP BY lot_id, date(hour)
+    """)
+
+
+def downgrade():
+    op.drop_table('lot_daily_rollup')
+    op.drop_table('lot_hourly_rollup')
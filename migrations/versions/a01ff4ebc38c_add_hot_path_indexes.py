@@ -0,0 +1,44 @@
+"""add hot path indexes
+
+Revision ID: a01ff4ebc38c
+Revises: ed8bfd3459a7
+Create Date: 2026-10-18 07:05:41.318112
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a01ff4ebc38c'
+down_revision = 'ed8bfd3459a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.create_index('ix_parking_lot_pin_code', ['pin_code'], unique=False)
+
+    with op.batch_alter_table('parking_spot', schema=None) as batch_op:
+        batch_op.create_index('ix_parking_spot_lot_id_status', ['lot_id', 'status', 'spot_number'], unique=False)
+
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.create_index('ix_reservations_user_id_status', ['user_id', 'status'], unique=False)
+        batch_op.create_index('ix_reservations_user_id_parking_timestamp', ['user_id', 'parking_timestamp', 'id'], unique=False)
+        batch_op.create_index('ix_reservations_vehicle_number_status', ['vehicle_number', 'status'], unique=False)
+        batch_op.create_index('ix_reservations_spot_id_parking_timestamp', ['spot_id', 'parking_timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_index('ix_reservations_spot_id_parking_timestamp')
+        batch_op.drop_index('ix_reservations_vehicle_number_status')
+        batch_op.drop_index('ix_reservations_user_id_parking_timestamp')
+        batch_op.drop_index('ix_reservations_user_id_status')
+
+    with op.batch_alter_table('parking_spot', schema=None) as batch_op:
+        batch_op.drop_index('ix_parking_spot_lot_id_status')
+
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.drop_index('ix_parking_lot_pin_code')
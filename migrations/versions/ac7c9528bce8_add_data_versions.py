@@ -0,0 +1,33 @@
+"""add data versions
+
+Revision ID: ac7c9528bce8
+Revises: a01ff4ebc38c
+Create Date: 2026-10-18 07:12:02.472479
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ac7c9528bce8'
+down_revision = 'a01ff4ebc38c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() (init-db, or older app.py on import) may
+    # already have the table
+    if sa.inspect(op.get_bind()).has_table('data_versions'):
+        return
+
+    op.create_table('data_versions',
+        sa.Column('scope', sa.String(length=50), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('scope')
+    )
+
+
+def downgrade():
+    op.drop_table('data_versions')
@@ -0,0 +1,26 @@
+"""add user reservation limit
+
+Revision ID: b8e5d1f04a72
+Revises: 4a6f0c2d8e19
+Create Date: 2026-10-18 09:42:18.660391
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e5d1f04a72'
+down_revision = '4a6f0c2d8e19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user_details', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('max_active_reservations', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user_details', schema=None) as batch_op:
+        batch_op.drop_column('max_active_reservations')
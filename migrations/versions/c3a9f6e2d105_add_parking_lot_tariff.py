@@ -0,0 +1,26 @@
+"""add parking lot tariff
+
+Revision ID: c3a9f6e2d105
+Revises: b8e5d1f04a72
+Create Date: 2026-10-18 11:07:53.214806
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a9f6e2d105'
+down_revision = 'b8e5d1f04a72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('tariff', sa.Text(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.drop_column('tariff')
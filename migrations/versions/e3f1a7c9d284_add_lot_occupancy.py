@@ -0,0 +1,36 @@
+"""add lot occupancy
+
+Revision ID: e3f1a7c9d284
+Revises: 9b4d3e6a2c51
+Create Date: 2026-10-18 08:24:10.661842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3f1a7c9d284'
+down_revision = '9b4d3e6a2c51'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() (init-db, or older app.py on import) may
+    # already have the table.
+    # Populate it afterwards with: flask --app app backfill-rollups
+    if sa.inspect(op.get_bind()).has_table('lot_occupancy'):
+        return
+
+    op.create_table('lot_occupancy',
+        sa.Column('lot_id', sa.Integer(), nullable=False),
+        sa.Column('since', sa.DateTime(), nullable=False),
+        sa.Column('hours', sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(['lot_id'], ['parking_lot.pl_id'], ),
+        sa.PrimaryKeyConstraint('lot_id')
+    )
+
+
+def downgrade():
+    op.drop_table('lot_occupancy')
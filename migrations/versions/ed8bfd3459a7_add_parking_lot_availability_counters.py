@@ -0,0 +1,37 @@
+"""add parking lot availability counters
+
+Revision ID: ed8bfd3459a7
+Revises: 
+Create Date: 2026-10-18 06:59:12.092455
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ed8bfd3459a7'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('available_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('occupied_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill the counters from the existing spots
+    op.execute("""
+        UPDATE parking_lot SET
+            available_count = (SELECT COUNT(*) FROM parking_spot
+                               WHERE parking_spot.lot_id = parking_lot.pl_id AND parking_spot.status = 'A'),
+            occupied_count = (SELECT COUNT(*) FROM parking_spot
+                              WHERE parking_spot.lot_id = parking_lot.pl_id AND parking_spot.status = 'O')
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.drop_column('occupied_count')
+        batch_op.drop_column('available_count')
@@ -0,0 +1,51 @@
+"""add active vehicle unique index
+
+Revision ID: f1d7b3a9c046
+Revises: c3a9f6e2d105
+Create Date: 2026-10-18 11:48:26.905137
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d7b3a9c046'
+down_revision = 'c3a9f6e2d105'
+branch_labels = None
+depends_on = None
+
+
+def normalize(vehicle_number):
+    # Same rule as normalize_vehicle_number in app.py
+    return re.sub(r'[^0-9A-Za-z]', '', vehicle_number or '').upper()
+
+
+def upgrade():
+    bind = op.get_bind()
+    for table in ('reservations', 'spot_holds'):
+        rows = bind.execute(sa.text(f'SELECT id, vehicle_number FROM {table}')).all()
+        changed = [{'id': row.id, 'vehicle_number': normalize(row.vehicle_number)}
+                   for row in rows if normalize(row.vehicle_number) != row.vehicle_number]
+        if changed:
+            bind.execute(sa.text(f'UPDATE {table} SET vehicle_number = :vehicle_number WHERE id = :id'), changed)
+
+    duplicates = bind.execute(sa.text(
+        "SELECT vehicle_number FROM reservations WHERE status = 'Active' GROUP BY vehicle_number HAVING count(*) > 1"
+    )).scalars().all()
+    if duplicates:
+        raise RuntimeError('Release the extra active reservations for these vehicles before upgrading: '
+                           + ', '.join(duplicates))
+
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_index('ix_reservations_vehicle_number_status')
+        batch_op.create_index('ux_reservations_active_vehicle', ['vehicle_number'], unique=True,
+                              sqlite_where=sa.text("status = 'Active'"))
+
+
+def downgrade():
+    with op.batch_alter_table('reservations', schema=None) as batch_op:
+        batch_op.drop_index('ux_reservations_active_vehicle')
+        batch_op.create_index('ix_reservations_vehicle_number_status', ['vehicle_number', 'status'], unique=False)
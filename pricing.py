@@ -0,0 +1,144 @@
+import json
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Tariff schedules, compiled into cumulative-cost tables.
+#
+# Parking is billed per started hour, counted from the moment the vehicle parked.
+# Billed hour i (0-based) of a stay costs
+#     price_per_hour * time_of_day[hour of week it starts in] * tier[i]
+# where time_of_day holds one multiplier per hour of the week (Monday 00:00 first)
+# and tier is a step function of how many hours have already been billed.
+#
+# A schedule is stored on the lot as JSON, multipliers relative to price_per_hour:
+#     {"time_of_day": [{"from": 8, "to": 20, "multiplier": 1.5, "days": [0, 1, 2, 3, 4]}],
+#      "tiers": [{"after": 3, "multiplier": 0.8}, {"after": 12, "multiplier": 0.5}]}
+# Later time_of_day entries override earlier ones; "days" (0 = Monday) defaults to
+# every day, and a rule whose "to" is not after "from" runs on past midnight into
+# the next day. With no schedule every hour costs price_per_hour, i.e.
+# ceil(hours) * price_per_hour.
+
+HOURS_PER_WEEK = 7 * 24
+EPOCH = datetime(1970, 1, 1)  # a Thursday, i.e. weekday 3
+MAX_TIER_HOURS = HOURS_PER_WEEK
+MICROSECOND = timedelta(microseconds=1)
+MICROS_PER_HOUR = 3_600_000_000
+
+
+def parse_schedule(text):
+    # JSON text from the lot to a validated schedule dict; blank means flat pricing.
+    # Raises ValueError with a message fit to show the user.
+    if not text or not text.strip():
+        return None
+    try:
+        schedule = json.loads(text)
+    except ValueError:
+        raise ValueError('The tariff must be valid JSON.')
+    if not isinstance(schedule, dict) or set(schedule) - {'time_of_day', 'tiers'}:
+        raise ValueError('The tariff may only contain "time_of_day" and "tiers".')
+
+    def whole(value, low, high):
+        return isinstance(value, int) and not isinstance(value, bool) and low <= value <= high
+
+    def multiplier(rule):
+        value = rule.get('multiplier')
+        return isinstance(value, (int, float)) and not isinstance(value, bool) and value >= 0
+
+    for rule in schedule.get('time_of_day', []):
+        if not (isinstance(rule, dict) and whole(rule.get('from'), 0, 23) and whole(rule.get('to'), 1, 24)
+                and multiplier(rule) and all(whole(day, 0, 6) for day in rule.get('days', range(7)))):
+            raise ValueError('Each time_of_day rule needs "from" (0-23), "to" (1-24) and a "multiplier" >= 0.')
+
+    previous = 0
+    for tier in schedule.get('tiers', []):
+        if not (isinstance(tier, dict) and whole(tier.get('after'), previous + 1, MAX_TIER_HOURS) and multiplier(tier)):
+            raise ValueError(f'Tiers need increasing whole "after" hours (at most {MAX_TIER_HOURS}) and a "multiplier" >= 0.')
+        previous = tier['after']
+
+    return schedule
+
+
+def compile_tariff(price_per_hour, schedule=None):
+    # Precompute everything an interval lookup needs:
+    #   rates:     price of a billed hour starting in each hour-of-week cell (168)
+    #   weekly:    cumulative rates over two weeks, so any run of < 168 hours starting
+    #              anywhere in the week is weekly[a + m] - weekly[a]
+    #   head:      head[s, n] = cost of the first n billed hours starting in cell s,
+    #              for n up to the last tier boundary, with tier multipliers applied
+    #   tail:      tier multiplier for every hour after the last boundary
+    schedule = schedule or {}
+    multipliers = np.ones(HOURS_PER_WEEK)
+    for rule in schedule.get('time_of_day', []):
+        # A rule ending at or before it starts runs on into the next morning
+        end = rule['to'] if rule['from'] < rule['to'] else rule['to'] + 24
+        for day in rule.get('days', range(7)):
+            for hour in range(rule['from'], end):
+                multipliers[(day * 24 + hour) % HOURS_PER_WEEK] = rule['multiplier']
+    rates = price_per_hour * multipliers
+
+    tiers = schedule.get('tiers', [])
+    horizon = tiers[-1]['after'] if tiers else 0
+    tier_multipliers = np.ones(horizon)
+    for tier in tiers[:-1]:
+        tier_multipliers[tier['after']:] = tier['multiplier']
+    tail = tiers[-1]['multiplier'] if tiers else 1.0
+
+    head = np.zeros((HOURS_PER_WEEK, horizon + 1))
+    if horizon:
+        cells = (np.arange(HOURS_PER_WEEK)[:, None] + np.arange(horizon)[None, :]) % HOURS_PER_WEEK
+        head[:, 1:] = np.cumsum(rates[cells] * tier_multipliers, axis=1)
+
+    return {
+        'rates': rates,
+        'weekly': np.concatenate(([0.0], np.cumsum(np.tile(rates, 2)))),
+        'week_total': rates.sum(),
+        'head': head,
+        'horizon': horizon,
+        'tail': tail,
+    }
+
+
+def billed_hours(start, end):
+    # Started hours between two datetimes, as the flat rate has always billed them
+    return math.ceil((end - start).total_seconds() / 3600)
+
+
+def hour_of_week(moment):
+    hours = (moment - EPOCH).total_seconds() // 3600
+    return int((hours + 3 * 24) % HOURS_PER_WEEK)
+
+
+def _cost(tariff, cells, hours):
+    # Cost of `hours` billed hours from hour-of-week `cells`; numpy arrays or scalars
+    horizon = tariff['horizon']
+    head = tariff['head'][cells, np.minimum(hours, horizon)]
+
+    extra = np.maximum(hours - horizon, 0)
+    start = (cells + horizon) % HOURS_PER_WEEK
+    weeks, rest = np.divmod(extra, HOURS_PER_WEEK)
+    tail = weeks * tariff['week_total'] + tariff['weekly'][start + rest] - tariff['weekly'][start]
+    return head + tariff['tail'] * tail
+
+
+def interval_cost(tariff, start, end):
+    # Cost of one stay: a couple of table lookups whatever its length
+    return float(_cost(tariff, hour_of_week(start), max(billed_hours(start, end), 0)))
+
+
+def _epoch_micros(moments):
+    # Microseconds since EPOCH as int64. Lists of datetimes go through timedelta
+    # arithmetic, which is several times faster than numpy's datetime conversion.
+    if isinstance(moments, np.ndarray) and np.issubdtype(moments.dtype, np.datetime64):
+        return (moments.astype('datetime64[us]') - np.datetime64(EPOCH, 'us')).astype(np.int64)
+    return np.fromiter(((moment - EPOCH) // MICROSECOND for moment in moments), dtype=np.int64, count=len(moments))
+
+
+def batch_costs(tariff, starts, ends):
+    # Vectorized interval_cost over equal-length sequences of datetimes (or numpy
+    # datetime64 arrays) for one lot. Returns a float64 array.
+    starts, ends = _epoch_micros(starts), _epoch_micros(ends)
+    hours = np.maximum(-((starts - ends) // MICROS_PER_HOUR), 0)
+    cells = (starts // MICROS_PER_HOUR + 3 * 24) % HOURS_PER_WEEK
+    return _cost(tariff, cells, hours)
@@ -0,0 +1,28 @@
+// Pincode / lot-name autocomplete for the search boxes. Suggestions come from the
+// /lotsearch endpoint; picking one fills in that lot's pincode.
+function attachLotSearch(input, searchUrl) {
+    var list = document.getElementById(input.getAttribute('list'));
+    var timer = null;
+
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+            var query = input.value.trim();
+            if (!query) {
+                list.innerHTML = '';
+                return;
+            }
+            fetch(searchUrl + '?q=' + encodeURIComponent(query))
+                .then(function (response) { return response.json(); })
+                .then(function (data) {
+                    list.innerHTML = '';
+                    data.results.forEach(function (lot) {
+                        var option = document.createElement('option');
+                        option.value = lot.pin_code;
+                        option.label = lot.lot_name + ' (' + lot.available_spots + ' free)';
+                        list.appendChild(option);
+                    });
+                });
+        }, 150);
+    });
+}
@@ -0,0 +1,44 @@
+// Draws the summary charts in the browser from the page's JSON data endpoint.
+// Each <canvas data-series="..." data-type="..."> is filled from the matching series.
+function drawSummaryCharts(dataUrl) {
+    fetch(dataUrl)
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+            document.querySelectorAll('canvas[data-series]').forEach(function (canvas) {
+                var series = data[canvas.dataset.series];
+                var type = canvas.dataset.type;
+                var colors = (canvas.dataset.colors || '').split(',');
+                var labels = series.labels;
+
+                if (type === 'histogram') {
+                    // Bucket labels such as "0-30" from the bin edges
+                    labels = series.bins.slice(0, -1).map(function (edge, i) {
+                        return edge + '-' + series.bins[i + 1];
+                    });
+                }
+
+                new Chart(canvas, {
+                    type: type === 'histogram' ? 'bar' : type,
+                    data: {
+                        labels: labels,
+                        datasets: [{
+                            label: canvas.dataset.label,
+                            data: series.values,
+                            backgroundColor: colors.length > 1 ? colors : colors[0],
+                            borderColor: type === 'line' ? colors[0] : 'black',
+                            borderWidth: 1,
+                            barPercentage: type === 'histogram' ? 1.0 : 0.4,
+                            categoryPercentage: type === 'histogram' ? 1.0 : 0.8
+                        }]
+                    },
+                    options: {
+                        plugins: { legend: { display: type === 'pie' } },
+                        scales: type === 'pie' ? {} : {
+                            x: { title: { display: true, text: canvas.dataset.xlabel } },
+                            y: { title: { display: true, text: canvas.dataset.ylabel }, beginAtZero: true }
+                        }
+                    }
+                });
+            });
+        });
+}
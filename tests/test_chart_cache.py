@@ -0,0 +1,60 @@
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import cached_chart, create_app, draw_bar_chart
+from config import TestingConfig
+
+THREADS = 8
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'parkease-test.db'}"
+
+    app = create_app(Config)
+    app.static_folder = str(tmp_path / 'static')
+    return app
+
+
+def test_threads_drawing_the_same_chart_leave_one_whole_png(app):
+    data = {'labels': ['Lot A', 'Lot B'], 'values': [120.0, 80.0]}
+    missed, saved = threading.Barrier(THREADS, timeout=30), threading.Barrier(THREADS, timeout=30)
+    results, errors = [], []
+
+    def draw():
+        missed.wait()  # every thread reaches the cache miss before any file exists
+        fig = draw_bar_chart(data, 'Parking Lot', 'Revenue', 'Revenue', 'purple')
+        savefig = fig.savefig
+
+        def savefig_then_wait(*args, **kwargs):
+            savefig(*args, **kwargs)
+            saved.wait()  # every thread has written its temp file before any renames it
+
+        fig.savefig = savefig_then_wait
+        return fig
+
+    def view():
+        try:
+            with app.app_context():
+                results.append(cached_chart('revenue_per_lot', 'global', 1, draw))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=view) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert len(set(results)) == 1
+    chart_dir = os.path.join(app.static_folder, 'charts')
+    assert os.listdir(chart_dir) == [os.path.basename(results[0])]
+    with open(os.path.join(app.static_folder, results[0]), 'rb') as png:
+        assert png.read(8) == b'\x89PNG\r\n\x1a\n'
@@ -0,0 +1,81 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db, provision_spots, ParkingLot, Reservation, User
+from config import TestingConfig
+
+RESERVATIONS = 50
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'parkease-test.db'}"
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        user = User(username='driver@parkease', password='secret', name='Driver', phone='9000000001',
+                    address='1 Test Street', pincode='751001')
+        db.session.add(user)
+        db.session.flush()
+        lot = ParkingLot(lot_name='Test Lot', address='Test Lot', pin_code='751001', price_per_hour=20.0,
+                         max_spots=RESERVATIONS, available_count=RESERVATIONS, user_id=user.uid)
+        db.session.add(lot)
+        db.session.flush()
+        provision_spots(lot.pl_id, 1, RESERVATIONS)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def add_reservations(app, count):
+    with app.app_context():
+        user = User.query.one()
+        spots = ParkingLot.query.one().parking_spot
+        start = datetime.now() - timedelta(days=count)
+        db.session.add_all(Reservation(
+            spot_id=spots[i].ps_id, user_id=user.uid, vehicle_number=f'OD02AB{i:04d}',
+            parking_timestamp=start + timedelta(days=i), leaving_timestamp=start + timedelta(days=i, hours=2),
+            parking_cost=40.0, status='Released'
+        ) for i in range(count))
+        db.session.commit()
+        return user.uid
+
+
+def dashboard_statements(app, client, uid):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = client.get(f'/userdashboard/{uid}')
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    assert response.status_code == 200
+    return response, statements
+
+
+def test_dashboard_statement_count_does_not_grow_with_history(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'driver@parkease', 'password': 'secret'})
+    uid = add_reservations(app, 0)
+    client.get(f'/userdashboard/{uid}')  # fills the per-worker caches
+
+    _, empty = dashboard_statements(app, client, uid)
+    add_reservations(app, RESERVATIONS)
+    page, full = dashboard_statements(app, client, uid)
+
+    assert b'OD02AB0049' in page.data  # the newest reservation heads the history
+    assert len(full) == len(empty), full
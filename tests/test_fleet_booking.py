@@ -0,0 +1,91 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as parkease
+from app import create_app, db, book_fleet, provision_spots, ParkingLot, Reservation, User
+from config import TestingConfig
+
+SPOTS = 10
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'parkease-test.db'}"
+        MAX_ACTIVE_RESERVATIONS = 3
+        MAX_FLEET_BOOKING = 5
+        LOCK_RETRY_ATTEMPTS = 2
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        user = User(username='fleet@parkease', password='secret', name='Fleet', phone='9000000001',
+                    address='1 Depot Road', pincode='751001')
+        db.session.add(user)
+        db.session.flush()
+        lot = ParkingLot(lot_name='Test Lot', address='Test Lot', pin_code='751001', price_per_hour=20.0,
+                         max_spots=SPOTS, available_count=SPOTS, user_id=user.uid)
+        db.session.add(lot)
+        db.session.flush()
+        provision_spots(lot.pl_id, 1, SPOTS)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'fleet@parkease', 'password': 'secret'})
+    return client
+
+
+def active_vehicles(app):
+    with app.app_context():
+        return sorted(db.session.execute(
+            db.select(Reservation.vehicle_number).where(Reservation.status == 'Active')).scalars())
+
+
+def test_fleet_request_over_max_fleet_booking_is_refused(app, client):
+    response = client.post('/fleetbook/1/1', json={'vehicle_numbers': [f'OD02FL{i:04d}' for i in range(6)]})
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'At most 5 vehicles can be booked at once.'}
+    assert active_vehicles(app) == []
+
+
+def test_fleet_booking_stops_at_the_remaining_limit(app, client):
+    response = client.post('/fleetbook/1/1', json={'vehicle_numbers': ['OD02FL0001']})
+    assert [r['status'] for r in response.get_json()['results']] == ['booked']
+
+    response = client.post('/fleetbook/1/1', json={
+        'vehicle_numbers': ['OD02FL0002', 'od02 fl 0002', 'OD02FL0001', 'OD02FL0003', 'OD02FL0004']
+    })
+    assert response.status_code == 200
+    assert [(r['vehicle_number'], r['status']) for r in response.get_json()['results']] == [
+        ('OD02FL0002', 'booked'),
+        ('OD02FL0002', 'duplicate'),
+        ('OD02FL0001', 'already_active'),
+        ('OD02FL0003', 'booked'),
+        ('OD02FL0004', 'over_limit'),
+    ]
+    assert active_vehicles(app) == ['OD02FL0001', 'OD02FL0002', 'OD02FL0003']
+
+
+def test_fleet_booking_retries_a_bounded_number_of_times(app, monkeypatch):
+    calls = []
+
+    def conflicting_claim(user, vehicle_numbers, lot_id):
+        calls.append(lot_id)
+        raise IntegrityError('INSERT INTO reservations', {}, Exception('UNIQUE constraint failed'))
+
+    monkeypatch.setattr(parkease, 'claim_fleet', conflicting_claim)
+    with app.app_context():
+        with pytest.raises(IntegrityError):
+            book_fleet(User.query.one(), ['OD02FL0001'], 1)
+    assert len(calls) == app.config['LOCK_RETRY_ATTEMPTS'] + 1
@@ -0,0 +1,88 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (create_app, db, bookings_in_use, provision_spots, vehicle_is_held, ParkingLot, SpotHold,
+                 User)
+from config import TestingConfig
+
+SPOTS = 4
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'parkease-test.db'}"
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        user = User(username='driver@parkease', password='secret', name='Driver', phone='9000000001',
+                    address='1 Test Street', pincode='751001', max_active_reservations=2)
+        db.session.add(user)
+        db.session.flush()
+        lot = ParkingLot(lot_name='Test Lot', address='Test Lot', pin_code='751001', price_per_hour=20.0,
+                         max_spots=SPOTS, available_count=SPOTS, user_id=user.uid)
+        db.session.add(lot)
+        db.session.flush()
+        provision_spots(lot.pl_id, 1, SPOTS)
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'driver@parkease', 'password': 'secret'})
+    return client
+
+
+def window(days, hours=2):
+    # A window far enough ahead that spot occupancy now doesn't matter
+    start = datetime.now().replace(second=0, microsecond=0) + timedelta(days=days)
+    return start, start + timedelta(hours=hours)
+
+
+def hold(client, vehicle_number, start, end):
+    return client.post('/holdlot/1/1', data={'vehicle_number': vehicle_number, 'start_time': start.isoformat(),
+                                             'end_time': end.isoformat()})
+
+
+def holds(app):
+    with app.app_context():
+        return [(h.vehicle_number, h.start_time) for h in SpotHold.query.order_by(SpotHold.id)]
+
+
+def test_holds_count_toward_the_reservation_limit(app, client):
+    first, second, third = window(1), window(2), window(3)
+    hold(client, 'OD02AA0001', *first)
+    hold(client, 'OD02AA0002', *second)
+    with app.app_context():
+        assert bookings_in_use(User.query.one()) == 2
+
+    hold(client, 'OD02AA0003', *third)
+    assert holds(app) == [('OD02AA0001', first[0]), ('OD02AA0002', second[0])]
+
+
+def test_overlapping_hold_for_the_same_vehicle_is_rejected(app, client):
+    start, end = window(1)
+    hold(client, 'OD02AA0001', start, end)
+    with app.app_context():
+        assert vehicle_is_held('OD02AA0001', start + timedelta(hours=1), end + timedelta(hours=1))
+        assert not vehicle_is_held('OD02AA0001', end, end + timedelta(hours=1))
+        assert not vehicle_is_held('OD02AA0002', start, end)
+
+    page = hold(client, 'od02 aa 0001', start + timedelta(hours=1), end + timedelta(hours=1))
+    assert holds(app) == [('OD02AA0001', start)]
+    page = client.get(page.headers['Location'])
+    assert b'already has a hold overlapping that window' in page.data
+
+    # Back to back is not an overlap
+    hold(client, 'OD02AA0001', end, end + timedelta(hours=1))
+    assert holds(app) == [('OD02AA0001', start), ('OD02AA0001', end)]
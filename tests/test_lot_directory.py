@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (create_app, create_admin, db, invalidate_lot_directory, lot_directory, prefix_matches,
+                 search_lots, ParkingLot, User)
+from config import TestingConfig
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'parkease-test.db'}"
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        create_admin()
+        add_lot('Station Road', '751001')
+        db.session.commit()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def add_lot(name, pin_code):
+    lot = ParkingLot(lot_name=name, address=name, pin_code=pin_code, price_per_hour=20.0, max_spots=0,
+                     user_id=User.query.one().uid)
+    db.session.add(lot)
+    invalidate_lot_directory()
+    return lot
+
+
+def test_reload_leaves_a_held_directory_untouched(app):
+    with app.app_context():
+        before = lot_directory()
+        add_lot('Station Square', '751002')
+        db.session.commit()
+        after = lot_directory()
+
+    assert after is not before
+    assert prefix_matches(before, 'station', 10) == [1]
+    assert before.search_ids == [1] * len(before.search_keys)
+    assert len(prefix_matches(after, 'station', 10)) == 2
+
+
+def test_directory_version_is_read_once_per_request(app):
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if 'data_versions' in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    with app.test_request_context():
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            first = search_lots('station')
+            second = search_lots('751001')
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
+    assert [lot['lot_name'] for lot in first] == ['Station Road']
+    assert first == second
+    assert len(statements) == 1
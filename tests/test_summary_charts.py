@@ -0,0 +1,99 @@
+import json
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import (create_app, create_admin, db, provision_spots, rebuild_user_stats, superuser_chart_data,
+                 user_chart_data, DURATION_BINS, ParkingLot, Reservation, User)
+from durations import duration_bin
+from config import TestingConfig
+
+
+@pytest.fixture
+def app(tmp_path):
+    class Config(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'parkease-test.db'}"
+
+    app = create_app(Config)
+    with app.app_context():
+        db.create_all()
+        create_admin()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+
+
+def chart_data_url(page):
+    return json.loads(re.search(rb'drawSummaryCharts\((.*?)\);', page.data).group(1))
+
+
+def test_summary_chart_url_keeps_the_date_range(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin@parkease.com', 'password': 'Admin@2025'})
+
+    page = client.get('/superUsersummary/1?start=2026-01-01&end=2026-01-31&note=%3C/script%3E')
+    assert b'</script>");' not in page.data
+    assert chart_data_url(page) == '/superUsersummary/1/data?start=2026-01-01&end=2026-01-31'
+
+    page = client.get('/superUsersummary/1?start=yesterday')
+    assert chart_data_url(page) == '/superUsersummary/1/data'
+
+
+def boundary_stays():
+    # Every bin edge exactly, a microsecond either side, and a stay past the last edge
+    for edge in DURATION_BINS:
+        for offset in (-1, 0, 1):
+            stay = timedelta(minutes=edge, microseconds=offset)
+            if stay >= timedelta(0):
+                yield stay
+    yield timedelta(minutes=DURATION_BINS[-1] + 1)
+
+
+def expected_histogram(stays):
+    histogram = [0] * (len(DURATION_BINS) - 1)
+    for stay in stays:
+        bucket = duration_bin(stay.total_seconds() / 60)
+        if bucket is not None:
+            histogram[bucket] += 1
+    return histogram
+
+
+def add_released(stays):
+    admin = User.query.one()
+    lot = ParkingLot(lot_name='Edge Lot', address='Edge Lot', pin_code='751001', price_per_hour=20.0,
+                     max_spots=1, available_count=1, user_id=admin.uid)
+    db.session.add(lot)
+    db.session.flush()
+    provision_spots(lot.pl_id, 1, 1)
+    spot = lot.parking_spot[0]
+    # Odd start times, with and without a fraction of a second, exercise the float error
+    parked = datetime(2026, 3, 7, 9, 13, 27, 123457)
+    for i, stay in enumerate(stays):
+        start = parked + timedelta(hours=i, microseconds=0 if i % 2 else 876543)
+        db.session.add(Reservation(spot_id=spot.ps_id, user_id=admin.uid, vehicle_number=f'OD02ED{i:04d}',
+                                   parking_timestamp=start, leaving_timestamp=start + stay,
+                                   parking_cost=20.0, status='Released'))
+    db.session.commit()
+
+
+def test_duration_histogram_matches_duration_bin_at_bin_edges(app):
+    stays = list(boundary_stays())
+    with app.app_context():
+        add_released(stays)
+        histogram = superuser_chart_data()['duration_histogram']['values']
+    assert histogram == expected_histogram(stays)
+
+
+def test_rebuilt_user_stats_bucket_like_duration_bin(app):
+    # The user_stats migration backfills with the same SQL as rebuild_user_stats()
+    stays = list(boundary_stays())
+    with app.app_context():
+        add_released(stays)
+        rebuild_user_stats()
+        histogram = user_chart_data(User.query.one())['duration_histogram']['values']
+    assert histogram == expected_histogram(stays)